@@ -8,14 +8,38 @@ This package provides tools to:
   1. solve a two body problem
   2. calculate photometric doppler beaming
   3. represent graphically determined parameters
+  4. serve model curves from a local service
+  5. match observed curves with a bank of templates
+  6. detect the doppler beaming with a periodogram
+  7. store curves of a binary system in a single array
+  8. check faster backends against the reference computation
+  9. read configuration files and execute run plans
+  10. synthesize populations of beaming binaries
+  11. compare live photometry with beaming models
+  12. profile time and memory of stages of the computation
+  13. save precomputed systems to memory-mapped snapshots
 
 """
 
-__all__ = ["orbit", "astunit", "plotorb", "dobe"]
+__all__ = ["orbit", "astunit", "plotorb", "dobe", "service",
+           "templates", "periodogram",
+           "ephemeris", "conformance",
+           "config", "population", "monitor",
+           "profiling", "snapshot"]
 __version__ = '0.1.1'
 
 
 from . import astunit
+from . import conformance
+from . import config
 from . import dobe
+from . import ephemeris
+from . import monitor
 from . import orbit
+from . import periodogram
 from . import plotorb
+from . import population
+from . import profiling
+from . import service
+from . import snapshot
+from . import templates
@@ -0,0 +1,380 @@
+"""
+Read configuration files of binary systems and execute them.
+
+A configuration file (see binary.conf) is parsed and validated into
+immutable run plans. Each plan describes parameters of a binary system,
+a grid of moments, outputs and a compute backend. The base sections
+define the plan "default". Additional sections [RUN name] define further
+plans which override any keys of the base sections, e.g.:
+
+    [RUN circular]
+    eccentricity = 0.0
+
+A run which doesn't set its own ephemeris key saves the ephemeris of
+the base sections with its name as a prefix, e.g. circular_ephemeris.npy.
+
+The execute function computes a plan with the vectorized backend or,
+from PARALLEL_THRESHOLD samples, in parallel. The serial backend runs
+only when a plan asks for it.
+
+"""
+import configparser
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from bidobe.orbit import Orbit2DParameters, Orbit2DOrientation, Orbit3D
+from bidobe.dobe import OrbitingObject
+from bidobe.ephemeris import Ephemeris
+from bidobe.profiling import profile_stage
+from bidobe.plotorb import (plot_projected_orbits, plot_radial_velocities,
+                            plot_light_curve, export_figures)
+
+
+BACKENDS = ("auto", "serial", "vectorized", "parallel")
+FIGURES = ("orbits", "velocities", "light_curve")
+
+# Samples computed at once by the vectorized backend and the number
+# of samples from which the auto backend runs in parallel.
+CHUNK_SIZE = 1000000
+PARALLEL_THRESHOLD = 4000000
+
+SystemParameters = namedtuple("SystemParameters", [
+    "mass1", "mass2", "temperature1", "temperature2", "radius1", "radius2",
+    "distance", "sum_major_axis", "eccentricity", "longitude_node",
+    "inclination", "periastron_argument", "passband"])
+
+Outputs = namedtuple("Outputs", ["figures", "directory", "format",
+                                 "ephemeris"])
+
+RunPlan = namedtuple("RunPlan", ["name", "parameters", "time_grid",
+                                 "outputs", "backend", "workers"])
+
+
+class TimeGrid(namedtuple("TimeGrid", ["multiply_period_length",
+                                       "samples"])):
+    """
+    TimeGrid describes equally spaced moments which start at zero and
+    cover a multiple of the orbital period.
+    """
+
+    def times(self, period, start=0, stop=None):
+        """
+        Return moments in seconds with indices from start to stop.
+
+        Parameters
+        ----------
+        period : float
+            The orbital period in seconds.
+        start, stop : int
+            Range of indices. Default all moments.
+        """
+        stop = self.samples if stop is None else stop
+        step = self.multiply_period_length*int(period)/self.samples
+
+        return step*np.arange(start, stop, dtype=float)
+
+
+_SECTIONS = {
+    "OBJECTS": (("mass1", float), ("mass2", float),
+                ("temperature1", int), ("temperature2", int),
+                ("radius1", float), ("radius2", float),
+                ("distance", float)),
+    "ORBITS": (("sum_major_axis", float), ("eccentricity", float),
+               ("longitude_node", float), ("inclination", float),
+               ("periastron_argument", float)),
+    "OBSERVATION": (("multiply_period_length", float),
+                    ("time_length_pieces", int), ("passband", str))}
+
+
+def load_plans(filename):
+    """
+    Read a configuration file and return a tuple of run plans.
+
+    Raises
+    ------
+    IOError
+        If the file doesn't exist.
+    ValueError
+        If any value is missing or invalid.
+    """
+    config = configparser.ConfigParser()
+
+    if config.read(filename) == []:
+        raise IOError("There is no {0} file".format(filename))
+
+    return parse_plans(config)
+
+
+def parse_plans(config):
+    """
+    Return a tuple of run plans from a ConfigParser object: the plan
+    "default" of the base sections and then a plan of each [RUN name]
+    section.
+
+    Raises
+    ------
+    ValueError
+        If values are invalid, a run is defined twice or runs save
+        ephemerides to the same file.
+    """
+    base = {}
+
+    for section in list(_SECTIONS) + ["OUTPUT", "EXECUTION"]:
+        if config.has_section(section):
+            base.update(config[section])
+
+    plans = [_make_plan("default", base)]
+
+    for section in config.sections():
+        if not section.startswith("RUN "):
+            continue
+
+        name = section[4:].strip()
+
+        if name in [plan.name for plan in plans]:
+            raise ValueError("Run {0} is defined twice".format(name))
+
+        values = dict(base)
+        values.update(config[section])
+
+        if "ephemeris" not in config[section] and base.get(
+                "ephemeris", "").strip():
+            directory, filename = os.path.split(base["ephemeris"].strip())
+            values["ephemeris"] = os.path.join(
+                directory, "{0}_{1}".format(name, filename))
+
+        plans.append(_make_plan(name, values))
+
+    paths = [os.path.normpath(plan.outputs.ephemeris) for plan in plans
+             if plan.outputs.ephemeris]
+
+    if len(set(paths)) < len(paths):
+        raise ValueError("Runs must save ephemerides to different files")
+
+    return tuple(plans)
+
+
+def _make_plan(name, values):
+    converted = {}
+    errors = []
+
+    for section, keys in _SECTIONS.items():
+        for key, kind in keys:
+            if key not in values:
+                errors.append("missing {0} in [{1}]".format(key, section))
+                continue
+            try:
+                converted[key] = kind(values[key])
+            except ValueError:
+                errors.append("{0} = {1} is not {2}".format(
+                    key, values[key], kind.__name__))
+
+    if errors:
+        raise ValueError("Run {0}: {1}".format(name, "; ".join(errors)))
+
+    errors = validate_parameters(converted)
+    figures = tuple(figure.strip() for figure in values.get(
+        "figures", ",".join(FIGURES)).split(",") if figure.strip())
+    backend = values.get("backend", "auto").strip()
+    workers = values.get("workers", "").strip()
+    errors.extend("unknown figure {0}".format(figure)
+                  for figure in figures if figure not in FIGURES)
+
+    if backend not in BACKENDS:
+        errors.append("backend must be one of: {0}".format(
+            ", ".join(BACKENDS)))
+
+    if workers and not (workers.isdigit() and int(workers) > 0):
+        errors.append("workers must be a positive integer")
+
+    if errors:
+        raise ValueError("Run {0}: {1}".format(name, "; ".join(errors)))
+
+    parameters = SystemParameters(**dict(
+        (field, converted[field]) for field in SystemParameters._fields))
+    time_grid = TimeGrid(converted["multiply_period_length"],
+                         converted["time_length_pieces"])
+    outputs = Outputs(figures, values.get("directory", "").strip() or None,
+                      values.get("format", "eps").strip(),
+                      values.get("ephemeris", "").strip() or None)
+
+    return RunPlan(name, parameters, time_grid, outputs, backend,
+                   int(workers) if workers else None)
+
+
+def validate_parameters(values):
+    """
+    Check converted parameters of a binary system and an observation
+    (the keys of binary.conf) and return a list of error messages.
+    """
+    errors = []
+    positive = ("mass1", "mass2", "temperature1", "temperature2", "radius1",
+                "radius2", "distance", "sum_major_axis",
+                "multiply_period_length", "time_length_pieces")
+
+    for key in positive:
+        if values[key] <= 0:
+            errors.append("{0} must be positive".format(key))
+
+    if not 0 <= values["eccentricity"] < 1:
+        errors.append("eccentricity must be in [0, 1)")
+
+    if not 0 <= values["inclination"] <= 180:
+        errors.append("inclination must be in [0, 180]")
+
+    if values["passband"] not in OrbitingObject.PASSBANDS_CENTRAL_WAVELENGTH:
+        errors.append("passband must be one of: {0}".format(", ".join(
+            sorted(OrbitingObject.PASSBANDS_CENTRAL_WAVELENGTH))))
+
+    return errors
+
+
+def build_system(parameters):
+    """
+    Return orbit1, orbit2, object1, object2 for parameters of a binary
+    system given as a SystemParameters object or a dictionary.
+    """
+    p = parameters if isinstance(parameters, dict) else parameters._asdict()
+    orbit1 = Orbit3D(
+        Orbit2DParameters(p["mass1"], p["mass2"], p["sum_major_axis"],
+                          p["eccentricity"]),
+        Orbit2DOrientation(p["longitude_node"], p["inclination"],
+                           p["periastron_argument"]))
+    orbit2 = Orbit3D(
+        Orbit2DParameters(p["mass2"], p["mass1"], p["sum_major_axis"],
+                          p["eccentricity"]),
+        Orbit2DOrientation(p["longitude_node"], p["inclination"],
+                           p["periastron_argument"] + 180))
+    object1 = OrbitingObject(p["distance"], p["radius1"],
+                             p["temperature1"], p["passband"])
+    object2 = OrbitingObject(p["distance"], p["radius2"],
+                             p["temperature2"], p["passband"])
+
+    return orbit1, orbit2, object1, object2
+
+
+def choose_backend(plan):
+    """Return the backend which executes the plan."""
+    if plan.backend != "auto":
+        return plan.backend
+    elif plan.time_grid.samples < PARALLEL_THRESHOLD:
+        return "vectorized"
+    else:
+        return "parallel"
+
+
+def execute(plan):
+    """
+    Compute an ephemeris of a run plan in the SI units.
+
+    A parallel computation with an ephemeris output writes it directly
+    to the .npy file and returns it memory-mapped.
+    """
+    backend = choose_backend(plan)
+    samples = plan.time_grid.samples
+
+    with profile_stage("execute", run=plan.name, backend=backend,
+                       samples=samples):
+        if backend == "parallel":
+            return _execute_parallel(plan)
+
+        ephemeris = Ephemeris(samples)
+
+        for start in range(0, samples, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, samples)
+
+            with profile_stage("compute_chunk", start=start, stop=stop):
+                ephemeris.data[start:stop] = _compute_chunk(
+                    (plan, start, stop, None, backend == "vectorized"))
+
+    return ephemeris
+
+
+def _execute_parallel(plan):
+    samples = plan.time_grid.samples
+    workers = plan.workers or os.cpu_count() or 1
+    chunk_size = min(CHUNK_SIZE, -(-samples//workers))
+    path = plan.outputs.ephemeris
+
+    if path:
+        data = np.lib.format.open_memmap(path, mode="w+",
+                                         dtype=Ephemeris.DTYPE,
+                                         shape=(samples,))
+        del data
+
+    ranges = [(start, min(start + chunk_size, samples))
+              for start in range(0, samples, chunk_size)]
+    ephemeris = None if path else Ephemeris(samples)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(_compute_chunk, [
+            (plan, start, stop, path, True) for start, stop in ranges])
+
+        for (start, stop), chunk in zip(ranges, chunks):
+            if ephemeris is not None:
+                ephemeris.data[start:stop] = chunk
+
+    if path:
+        return Ephemeris.load(path, mmap=True)
+
+    return ephemeris
+
+
+def _compute_chunk(task):
+    plan, start, stop, path, vectorized = task
+    orbit1, orbit2, object1, object2 = build_system(plan.parameters)
+    time = plan.time_grid.times(orbit1.period, start, stop)
+    data = Ephemeris.from_orbits(orbit1, orbit2, object1, object2, time,
+                                 vectorized).data
+
+    if path is None:
+        return data
+
+    output = np.load(path, mmap_mode="r+")
+    output[start:stop] = data
+    output.flush()
+
+
+def write_outputs(plan, ephemeris):
+    """
+    Save the ephemeris in the SI units if requested and display or save
+    figures in days, AU and km/s. Units of the ephemeris are converted
+    in place.
+    """
+    outputs = plan.outputs
+    on_disk = isinstance(ephemeris.data, np.memmap)
+
+    if outputs.ephemeris and not on_disk:
+        with profile_stage("save_ephemeris", run=plan.name):
+            ephemeris.save(outputs.ephemeris)
+
+    if not outputs.figures:
+        return
+
+    with profile_stage("convert_units", run=plan.name):
+        ephemeris.convert(time="days", position="AU", velocity="km/s")
+
+    if outputs.directory:
+        export_figures([{"name": plan.name, "time": ephemeris.time,
+                         "orbit1": ephemeris.position1,
+                         "orbit2": ephemeris.position2,
+                         "velocity1": ephemeris.velocity1,
+                         "velocity2": ephemeris.velocity2,
+                         "magnitude": ephemeris.magnitude}],
+                       outputs.directory, outputs.figures, outputs.format,
+                       position_unit="AU", time_unit="days",
+                       velocity_unit="km/s")
+        return
+
+    if "orbits" in outputs.figures:
+        with profile_stage("figure", kind="orbits", system=plan.name):
+            plot_projected_orbits(ephemeris.position1, ephemeris.position2,
+                                  "AU", "AU")
+    if "velocities" in outputs.figures:
+        with profile_stage("figure", kind="velocities", system=plan.name):
+            plot_radial_velocities(ephemeris.time, ephemeris.velocity1,
+                                   ephemeris.velocity2, "days", "km/s")
+    if "light_curve" in outputs.figures:
+        with profile_stage("figure", kind="light_curve", system=plan.name):
+            plot_light_curve(ephemeris.time, ephemeris.magnitude, "days")
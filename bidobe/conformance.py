@@ -0,0 +1,279 @@
+"""
+Compare faster ways of computing curves of binary systems with
+the reference one: the Orbit3D.update method and the binary_brightness
+function called for each moment.
+
+Random systems are drawn from the whole space of parameters (eccentricity
+up to 0.99, all inclinations and passbands). For each backend the maximum
+and RMS errors relative to the amplitude of each reference curve and
+the throughput are reported. A backend fails if any error exceeds its
+declared tolerance. A backend may declare the largest eccentricity it
+supports; systems beyond it are reported as unsupported and aren't
+computed. A backend which rejects a system within its domain fails.
+
+Run all registered backends from the command line:
+  $ python3 -m bidobe.conformance --systems 50 --samples 200
+
+"""
+import argparse
+import sys
+from time import perf_counter
+import numpy as np
+from bidobe.orbit import OrbitFourierSeries
+from bidobe.dobe import OrbitingObject
+from bidobe.ephemeris import Ephemeris
+from bidobe.config import build_system
+
+
+COLUMNS = ("x1", "y1", "x2", "y2", "v1", "v2", "mag")
+
+
+class Backend:
+    """
+    Backend represents a way of computing curves and tolerances of its
+    errors relative to the amplitude of reference curves.
+    """
+
+    def __init__(self, name, compute, tolerance, max_eccentricity=None):
+        """
+        Parameters
+        ----------
+        name : str
+            The name in the report.
+        compute : callable
+            compute(orbit1, orbit2, object1, object2, time) returns
+            a dictionary or an Ephemeris with any of the columns: x1, y1,
+            x2, y2, v1, v2, mag. If it raises ValueError for a system
+            within the domain, the backend fails.
+        tolerance : float
+            The maximum relative error of every column.
+        max_eccentricity : float
+            The largest supported eccentricity. Default None, all orbits.
+        """
+        self.name = name
+        self.compute = compute
+        self.tolerance = tolerance
+        self.max_eccentricity = max_eccentricity
+
+    def supports(self, parameters):
+        """Check whether a system is within the domain of the backend."""
+        return (self.max_eccentricity is None
+                or parameters["eccentricity"] <= self.max_eccentricity)
+
+    @property
+    def domain(self):
+        if self.max_eccentricity is None:
+            return "all"
+
+        return "e<={0:g}".format(self.max_eccentricity)
+
+
+def _vectorized(orbit1, orbit2, object1, object2, time):
+    return Ephemeris.from_orbits(orbit1, orbit2, object1, object2, time)
+
+
+def _fourier(orbit1, orbit2, object1, object2, time):
+    series = OrbitFourierSeries.from_orbits(orbit1, orbit2, object1, object2)
+
+    return {"v1": series.evaluate(time, "velocity1"),
+            "v2": series.evaluate(time, "velocity2"),
+            "mag": series.evaluate(time, "magnitude")}
+
+
+# The Fourier series of orbits with e >= 0.98 doesn't converge within
+# the default number of terms.
+BACKENDS = [Backend("vectorized", _vectorized, 1e-7),
+            Backend("fourier", _fourier, 1e-5, max_eccentricity=0.95)]
+
+
+def register_backend(backend):
+    """Add a backend checked by default by run_conformance."""
+    BACKENDS.append(backend)
+
+
+def random_systems(number, seed=0):
+    """
+    Draw parameters of binary systems. The first systems have extreme
+    eccentricities and inclinations.
+
+    Returns
+    -------
+    systems : list of dict
+        Parameters in the units of the binary.conf file.
+    """
+    random = np.random.RandomState(seed)
+    passbands = sorted(OrbitingObject.PASSBANDS_CENTRAL_WAVELENGTH)
+    extremes = [(0.0, 0.0), (0.99, 90.0), (0.99, 180.0), (0.5, 0.0)]
+    systems = []
+
+    for i in range(number):
+        if i < len(extremes):
+            eccentricity, inclination = extremes[i]
+        else:
+            eccentricity = random.uniform(0.0, 0.99)
+            inclination = random.uniform(0.0, 180.0)
+
+        systems.append({
+            "mass1": random.uniform(0.5, 5.0),
+            "mass2": random.uniform(0.5, 5.0),
+            "temperature1": random.uniform(3000.0, 30000.0),
+            "temperature2": random.uniform(5500.0, 30000.0),
+            "radius1": random.uniform(0.5, 5.0),
+            "radius2": random.uniform(0.5, 5.0),
+            "distance": random.uniform(10.0, 5000.0),
+            "sum_major_axis": 10**random.uniform(9.5, 12.0),
+            "eccentricity": eccentricity,
+            "longitude_node": random.uniform(0.0, 360.0),
+            "inclination": inclination,
+            "periastron_argument": random.uniform(0.0, 360.0),
+            "passband": passbands[i % len(passbands)]})
+
+    return systems
+
+
+def run_conformance(backends=None, systems=20, samples=200, seed=0):
+    """
+    Compare backends with the reference computation.
+
+    Parameters
+    ----------
+    backends : list of Backend
+        Default all registered backends.
+    systems : int
+        The number of random systems. Default 20.
+    samples : int
+        The number of moments per system (spread over two periods).
+        Default 200.
+    seed : int
+        The seed of the random generator. Default 0.
+
+    Returns
+    -------
+    results : list of dict
+        One dictionary per backend and one for the reference with keys:
+        backend, domain, systems, unsupported (systems outside
+        the domain), skipped (systems within the domain which the backend
+        rejected), throughput (samples per second), max_error, rms_error
+        (dictionaries column -> relative error), tolerance, passed.
+    """
+    backends = BACKENDS if backends is None else backends
+    parameters = random_systems(systems, seed)
+    random = np.random.RandomState(seed + 1)
+    references = []
+    elapsed = 0.0
+
+    for p in parameters:
+        orbit1, orbit2, object1, object2 = build_system(p)
+        time = np.sort(random.uniform(0.0, 2*orbit1.period, samples))
+        start = perf_counter()
+        reference = Ephemeris.from_orbits(orbit1, orbit2, object1, object2,
+                                          time, vectorized=False)
+        elapsed += perf_counter() - start
+        references.append((p, time, reference.data))
+
+    results = [{"backend": "reference", "domain": "all", "systems": systems,
+                "unsupported": 0, "skipped": 0,
+                "throughput": systems*samples/elapsed, "max_error": {},
+                "rms_error": {}, "tolerance": 0.0, "passed": True}]
+
+    for backend in backends:
+        results.append(_check_backend(backend, references))
+
+    return results
+
+
+def _check_backend(backend, references):
+    squares = {}
+    counts = {}
+    max_error = {}
+    elapsed = 0.0
+    computed = 0
+    skipped = 0
+    unsupported = 0
+
+    for p, time, reference in references:
+        if not backend.supports(p):
+            unsupported += 1
+            continue
+
+        system = build_system(p)
+        start = perf_counter()
+
+        try:
+            curves = backend.compute(*(system + (time,)))
+        except ValueError:
+            skipped += 1
+            continue
+
+        elapsed += perf_counter() - start
+        computed += len(time)
+
+        if isinstance(curves, Ephemeris):
+            curves = dict((name, curves.data[name]) for name in COLUMNS)
+
+        for name in COLUMNS:
+            if name not in curves:
+                continue
+
+            amplitude = np.ptp(reference[name])
+            error = np.abs(np.asarray(curves[name]) - reference[name])
+
+            if amplitude > 0:
+                error = error/amplitude
+
+            max_error[name] = max(max_error.get(name, 0.0), error.max())
+            squares[name] = squares.get(name, 0.0) + np.sum(error**2)
+            counts[name] = counts.get(name, 0) + len(error)
+
+    rms_error = dict((name, np.sqrt(squares[name]/counts[name]))
+                     for name in squares)
+    passed = (computed > 0 and skipped == 0
+              and all(error <= backend.tolerance
+                      for error in max_error.values()))
+
+    return {"backend": backend.name, "domain": backend.domain,
+            "systems": len(references), "unsupported": unsupported,
+            "skipped": skipped,
+            "throughput": computed/elapsed if elapsed > 0 else float("inf"),
+            "max_error": max_error, "rms_error": rms_error,
+            "tolerance": backend.tolerance, "passed": passed}
+
+
+def format_report(results):
+    """Return results of run_conformance as a text table."""
+    header = ("{0:<12} {1:>9} {2:>11} {3:>8} {4:>12} {5:>10} {6:>10} "
+              "{7:>10} {8:>6}").format(
+        "backend", "domain", "unsupported", "skipped", "samples/s",
+        "max err", "rms err", "tolerance", "status")
+    lines = [header, "-"*len(header)]
+
+    for result in results:
+        worst = max(result["max_error"].values() or [0.0])
+        rms = max(result["rms_error"].values() or [0.0])
+        lines.append(
+            "{0:<12} {1:>9} {2:>11} {3:>8} {4:>12.0f} {5:>10.2e} {6:>10.2e} "
+            "{7:>10.1e} {8:>6}".format(
+                result["backend"], result["domain"], result["unsupported"],
+                result["skipped"], result["throughput"], worst, rms,
+                result["tolerance"], "PASS" if result["passed"] else "FAIL"))
+
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare compute backends with the reference.")
+    parser.add_argument("--systems", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    results = run_conformance(systems=args.systems, samples=args.samples,
+                              seed=args.seed)
+    print(format_report(results))
+
+    if not all(result["passed"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
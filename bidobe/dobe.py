@@ -4,6 +4,7 @@ in a binary system. Plot a light curve caused by the doppler beaming.
 
 """
 from math import pow, log10, e
+import numpy as np
 from bidobe.astunit import UnitsConverter
 
 
@@ -14,6 +15,14 @@ class OrbitingObject(UnitsConverter):
     beaming) varies with time.
     """
 
+    # Central wavelengths of passbands in meters.
+    PASSBANDS_CENTRAL_WAVELENGTH = {
+        "U": 3.6e-7,
+        "B": 4.4e-7,
+        "V": 5.5e-7,
+        "I": 9.0e-7
+    }
+
     def __init__(self, distance, radius, temperature, passband):
         """
         Set basic parameters of an object in a binary system.
@@ -46,14 +55,8 @@ class OrbitingObject(UnitsConverter):
         passband : str
             Available: U, B, V, I.
         """
-        passbands_central_wavelength = {
-            "U": 3.6e-7,
-            "B": 4.4e-7,
-            "V": 5.5e-7,
-            "I": 9.0e-7
-        }
-
-        return self.LIGHT_SPEED/passbands_central_wavelength[passband]
+        return (self.LIGHT_SPEED
+                / self.PASSBANDS_CENTRAL_WAVELENGTH[passband])
 
     def calculate_stationary_flux(self):
         # For smaller temperatures than 5000K there is no sense
@@ -101,3 +104,30 @@ def binary_brightness(object1, object2, zero_level=16.0):
     dmag = 2.5*log10(abs(doppler_flux)/(object1.flux + object2.flux))
 
     return zero_level + dmag
+
+
+def binary_brightness_curve(object1, object2, velocity1, velocity2,
+                            zero_level=16.0):
+    """
+    Calculate brightness of a binary system for arrays of radial velocities.
+    It is a vectorized version of the binary_brightness function and doesn't
+    change the doppler coefficients of objects.
+
+    Parameters
+    ----------
+    object1, object2 : OrbitingObject
+        Object represents an orbiting object in a binary system.
+    velocity1, velocity2 : numpy.array(dtype=float)
+        Radial velocities of each object in meters per second.
+    zero_level : float
+        A constant value which is added to a light curve generated by
+        the doppler beaming. Default value 16.0.
+    """
+    coefficient1 = (1.0 + (3.0 - object1.alpha)*np.asarray(velocity1)
+                    / object1.LIGHT_SPEED)
+    coefficient2 = (1.0 + (3.0 - object2.alpha)*np.asarray(velocity2)
+                    / object2.LIGHT_SPEED)
+    doppler_flux = coefficient1*object1.flux + coefficient2*object2.flux
+    dmag = 2.5*np.log10(np.abs(doppler_flux)/(object1.flux + object2.flux))
+
+    return zero_level + dmag
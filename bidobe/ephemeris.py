@@ -0,0 +1,237 @@
+"""
+Store positions, radial velocities and brightness of a binary system
+in a single structured array.
+
+An Ephemeris object keeps all columns in one contiguous block of memory.
+Columns and positions of each object are views of this block, so they
+can be passed to the plotorb functions without copying. Units can be
+converted in place or as cached copies of single columns.
+
+"""
+from numbers import Integral
+import numpy as np
+from bidobe.astunit import UnitsConverter
+from bidobe.dobe import binary_brightness, binary_brightness_curve
+
+
+class Ephemeris(UnitsConverter):
+    """
+    Ephemeris represents time, projected positions and radial velocities
+    of both objects and brightness of a binary system.
+    """
+
+    DTYPE = np.dtype([("time", float), ("x1", float), ("y1", float),
+                      ("x2", float), ("y2", float), ("v1", float),
+                      ("v2", float), ("mag", float)])
+    QUANTITIES = {"time": ("time",),
+                  "position": ("x1", "y1", "x2", "y2"),
+                  "velocity": ("v1", "v2")}
+
+    def __init__(self, data, units=None):
+        """
+        Parameters
+        ----------
+        data : int or numpy.array(dtype=Ephemeris.DTYPE)
+            The number of samples or an existing array which is used
+            without copying.
+        units : dict
+            Units of time, position and velocity of the data.
+            Default SI units: s, m, m/s.
+        """
+        if isinstance(data, Integral):
+            data = np.zeros(data, dtype=self.DTYPE)
+        elif data.dtype != self.DTYPE:
+            raise ValueError("The data type must be Ephemeris.DTYPE")
+
+        self.data = data
+        self.units = {"time": "s", "position": "m", "velocity": "m/s"}
+        self.units.update(units or {})
+        self._converted = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def unit_factors(self):
+        """
+        Return a dictionary: quantity -> {unit -> its value in the SI
+        units}.
+        """
+        return {"time": {"s": 1.0, "min": self.MINUTE, "days": self.DAY},
+                "position": {"m": 1.0, "AU": self.AU,
+                             "Rsun": self.SUN_RADIUS, "pc": self.PARSEC},
+                "velocity": {"m/s": 1.0, "km/s": 1000.0}}
+
+    def _scale(self, quantity, unit):
+        # The factor which converts the stored unit of a quantity to unit.
+        factors = self.unit_factors()[quantity]
+
+        if unit not in factors:
+            raise ValueError("{0} isn't a unit of {1}, use one of: {2}".format(
+                unit, quantity, ", ".join(factors)))
+
+        return factors[self.units[quantity]]/factors[unit]
+
+    @classmethod
+    def from_orbits(cls, orbit1, orbit2, object1, object2, time,
+                    vectorized=True, zero_level=16.0):
+        """
+        Compute an ephemeris of a binary system in the SI units.
+
+        Parameters
+        ----------
+        orbit1, orbit2 : Orbit3D
+            Orbits of both objects in the binary system.
+        object1, object2 : OrbitingObject
+            Objects in the binary system.
+        time : 1D numpy.array(dtype=float)
+            Moments in seconds.
+        vectorized : bool
+            Compute all moments at once. If False the update methods
+            are called for each moment. Default True.
+        zero_level : float
+            The zero level of the light curve. Default 16.0.
+        """
+        ephemeris = cls(len(time))
+        data = ephemeris.data
+        data["time"] = time
+
+        if vectorized:
+            data["x1"], data["y1"] = orbit1.calculate_projected_positions(time)
+            data["x2"], data["y2"] = orbit2.calculate_projected_positions(time)
+            data["v1"] = orbit1.calculate_radial_velocities(time)
+            data["v2"] = orbit2.calculate_radial_velocities(time)
+            data["mag"] = binary_brightness_curve(
+                object1, object2, data["v1"], data["v2"], zero_level)
+            return ephemeris
+
+        for i, t in enumerate(time):
+            orbit1.update(t)
+            orbit2.update(t)
+            object1.calculate_doppler_coefficient(orbit1.radial_velocity)
+            object2.calculate_doppler_coefficient(orbit2.radial_velocity)
+            data[i] = (t,) + tuple(orbit1.projected_position) + tuple(
+                orbit2.projected_position) + (
+                orbit1.radial_velocity, orbit2.radial_velocity,
+                binary_brightness(object1, object2, zero_level))
+
+        return ephemeris
+
+    @property
+    def time(self):
+        return self.data["time"]
+
+    @property
+    def velocity1(self):
+        return self.data["v1"]
+
+    @property
+    def velocity2(self):
+        return self.data["v2"]
+
+    @property
+    def magnitude(self):
+        return self.data["mag"]
+
+    @property
+    def position1(self):
+        """Position of the first object as a (*,2) view."""
+        return self._positions("x1")
+
+    @property
+    def position2(self):
+        """Position of the second object as a (*,2) view."""
+        return self._positions("x2")
+
+    def _positions(self, field):
+        offset = self.DTYPE.fields[field][1]
+        step = self.DTYPE.itemsize
+
+        return np.ndarray(shape=(len(self.data), 2), dtype=float,
+                          buffer=self.data, offset=offset,
+                          strides=(step, self.DTYPE["x1"].itemsize))
+
+    def column(self, name, unit=None):
+        """
+        Return a column in a given unit. If the unit differs from the
+        stored one a converted copy is made once and cached.
+
+        Parameters
+        ----------
+        name : str
+            One of the fields of Ephemeris.DTYPE.
+        unit : str
+            A unit of the quantity of the column from the unit_factors
+            method. Default stored unit.
+
+        Raises
+        ------
+        ValueError
+            If the unit isn't a unit of the column, e.g. any unit of
+            the magnitude.
+        """
+        quantity = self._quantity(name)
+
+        if unit is None:
+            return self.data[name]
+        elif quantity is None:
+            raise ValueError("{0} has no unit".format(name))
+        elif unit == self.units[quantity]:
+            return self.data[name]
+
+        key = (name, unit)
+
+        if key not in self._converted:
+            self._converted[key] = self.data[name]*self._scale(quantity, unit)
+
+        return self._converted[key]
+
+    def convert(self, time=None, position=None, velocity=None):
+        """
+        Convert units of columns in place.
+
+        Parameters
+        ----------
+        time, position, velocity : str
+            New units, see the unit_factors method. None leaves a unit.
+
+        Raises
+        ------
+        ValueError
+            If a unit doesn't belong to its quantity. No column is
+            converted then.
+        """
+        scales = {}
+
+        for quantity, unit in (("time", time), ("position", position),
+                               ("velocity", velocity)):
+            if unit is not None and unit != self.units[quantity]:
+                scales[quantity] = (unit, self._scale(quantity, unit))
+
+        for quantity, (unit, scale) in scales.items():
+            for name in self.QUANTITIES[quantity]:
+                self.data[name] *= scale
+
+            self.units[quantity] = unit
+
+        self._converted.clear()
+
+        return self
+
+    def _quantity(self, name):
+        for quantity, names in self.QUANTITIES.items():
+            if name in names:
+                return quantity
+
+        return None
+
+    def save(self, filename):
+        """Save the data to a .npy file. Units aren't saved."""
+        np.save(filename, self.data)
+
+    @classmethod
+    def load(cls, filename, units=None, mmap=False):
+        """
+        Load data saved by the save method. A memory-mapped file is opened
+        copy-on-write, so conversions of units don't change it.
+        """
+        return cls(np.load(filename, mmap_mode="c" if mmap else None), units)
@@ -0,0 +1,433 @@
+"""
+Compare live photometry of many binary systems with their beaming models.
+
+A StreamMonitor object keeps constants of each tracked system (period,
+semi-amplitudes, fluxes and beaming factors of both objects) in one
+structured array, so a batch of points from any systems is predicted with
+array operations. The Kepler equation is solved by the Newton method
+started from the last eccentric anomaly of a system, which usually
+converges in one or two iterations for consecutive points. Residuals are
+accumulated as running statistics, so the cost of a point doesn't depend
+on the history of a system.
+
+An AsyncStreamMonitor object collects points submitted by coroutines
+into micro-batches:
+
+    monitor = StreamMonitor()
+    monitor.add_system("V1", *build_system(parameters))
+    stream = AsyncStreamMonitor(monitor)
+    stream.start()
+    prediction, residual = await stream.submit("V1", time, magnitude)
+
+"""
+import asyncio
+from math import pi
+import numpy as np
+from bidobe.astunit import UnitsConverter
+
+
+class StreamMonitor:
+    """
+    StreamMonitor predicts magnitudes of tracked binary systems and
+    accumulates residuals of observed points.
+    """
+
+    STATE = np.dtype([
+        ("period", float), ("periastron_passage", float),
+        ("eccentricity", float), ("amplitude1", float),
+        ("amplitude2", float), ("periastron_argument1", float),
+        ("periastron_argument2", float), ("flux1", float), ("flux2", float),
+        ("beaming1", float), ("beaming2", float), ("zero_level", float),
+        ("mean_anomaly", float), ("eccentric_anomaly", float),
+        ("last_time", float), ("count", np.int64), ("mean", float),
+        ("m2", float), ("rejected", np.int64)])
+
+    # The largest change of the mean anomaly in radians for which
+    # the Newton method starts from the last eccentric anomaly.
+    WARM_START_LIMIT = 1.0
+
+    def __init__(self, capacity=1024, tolerance=1e-12, max_iterations=50):
+        """
+        Parameters
+        ----------
+        capacity : int
+            The initial number of systems. The state grows when needed.
+        tolerance : float
+            Maximum change of the eccentric anomaly in the last iteration.
+        max_iterations : int
+            Maximum number of iterations of the Newton method.
+        """
+        self.state = np.zeros(capacity, dtype=self.STATE)
+        self.keys = {}
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.iterations = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add_system(self, key, orbit1, orbit2, object1, object2,
+                   zero_level=16.0):
+        """
+        Start tracking a binary system.
+
+        Parameters
+        ----------
+        key : hashable
+            The name of the system used by the update method.
+        orbit1, orbit2 : Orbit3D
+            Orbits of both objects in the binary system.
+        object1, object2 : OrbitingObject
+            Objects in the binary system.
+        zero_level : float
+            The zero level of the light curve. Default 16.0.
+
+        Returns
+        -------
+        index : int
+            The row of the system in the state array.
+        """
+        if key in self.keys:
+            raise ValueError("The system {0} is already tracked".format(key))
+
+        index = len(self.keys)
+
+        if index == len(self.state):
+            state = np.zeros(2*len(self.state), dtype=self.STATE)
+            state[:index] = self.state
+            self.state = state
+
+        c = UnitsConverter.LIGHT_SPEED
+        self.state[index] = (
+            orbit1.period, orbit1.periastron_passage, orbit1.eccentricity,
+            orbit1.calculate_radial_velocity_amplitude(),
+            orbit2.calculate_radial_velocity_amplitude(),
+            orbit1.periastron_argument, orbit2.periastron_argument,
+            object1.flux, object2.flux, (3.0 - object1.alpha)/c,
+            (3.0 - object2.alpha)/c, zero_level, 0.0, 0.0, np.nan, 0, 0.0,
+            0.0, 0)
+        self.keys[key] = index
+
+        return index
+
+    def indices(self, keys):
+        """Return rows of the state array for names of systems."""
+        try:
+            return np.fromiter((self.keys[key] for key in keys), dtype=np.intp)
+        except KeyError as error:
+            raise ValueError("The system {0} isn't tracked".format(
+                error.args[0]))
+
+    def predict(self, index, time):
+        """
+        Calculate magnitudes of systems at given moments. It doesn't
+        change the state.
+
+        Parameters
+        ----------
+        index : 1D numpy.array(dtype=int)
+            Rows of the state array, see the indices method.
+        time : 1D numpy.array(dtype=float)
+            Moments in seconds.
+        """
+        return self._predict(np.asarray(index, dtype=np.intp),
+                             np.asarray(time, dtype=float))[0]
+
+    def _predict(self, index, time):
+        s = self.state[index]
+        eccentricity = s["eccentricity"]
+        mean_anomaly = np.mod(2*pi*(time - s["periastron_passage"])
+                              / s["period"], 2*pi)
+
+        # Start from the last eccentric anomaly moved by the first order
+        # change. The mean anomaly is unwrapped around the last one, so
+        # the root is close to the starting point.
+        change = np.mod(mean_anomaly - s["mean_anomaly"] + pi, 2*pi) - pi
+        warm = (np.abs(change) <= self.WARM_START_LIMIT) & ~np.isnan(
+            s["last_time"])
+        target = np.where(warm, s["mean_anomaly"] + change, mean_anomaly)
+        eccentric_anomaly = np.where(
+            warm, s["eccentric_anomaly"]
+            + change/(1 - eccentricity*np.cos(s["eccentric_anomaly"])),
+            np.where(eccentricity < 0.8,
+                     mean_anomaly + eccentricity*np.sin(mean_anomaly), pi))
+
+        for i in range(self.max_iterations):
+            step = ((eccentric_anomaly
+                     - eccentricity*np.sin(eccentric_anomaly) - target)
+                    / (1 - eccentricity*np.cos(eccentric_anomaly)))
+            eccentric_anomaly -= step
+            self.iterations += 1
+
+            if np.all(np.abs(step) < self.tolerance):
+                break
+
+        eccentric_anomaly = np.mod(eccentric_anomaly, 2*pi)
+        true_anomaly = 2*np.arctan2(
+            np.sqrt(1 + eccentricity)*np.sin(0.5*eccentric_anomaly),
+            np.sqrt(1 - eccentricity)*np.cos(0.5*eccentric_anomaly))
+
+        # See Orbit3D.calculate_radial_velocity and binary_brightness.
+        velocity1 = s["amplitude1"]*(
+            np.cos(s["periastron_argument1"] + true_anomaly)
+            + eccentricity*np.cos(s["periastron_argument1"]))
+        velocity2 = s["amplitude2"]*(
+            np.cos(s["periastron_argument2"] + true_anomaly)
+            + eccentricity*np.cos(s["periastron_argument2"]))
+        doppler_flux = (s["flux1"]*(1.0 + s["beaming1"]*velocity1)
+                        + s["flux2"]*(1.0 + s["beaming2"]*velocity2))
+        magnitude = s["zero_level"] + 2.5*np.log10(
+            np.abs(doppler_flux)/(s["flux1"] + s["flux2"]))
+
+        return magnitude, mean_anomaly, eccentric_anomaly
+
+    def update(self, keys, time, magnitude):
+        """
+        Compare observed points with models and update statistics
+        of residuals. Points with a non-finite time or magnitude are
+        rejected: their residuals are NaN and they change neither
+        the state nor the statistics of their systems.
+
+        Parameters
+        ----------
+        keys : sequence or 1D numpy.array(dtype=int)
+            Names of systems of each point or rows of the state array.
+        time : 1D numpy.array(dtype=float)
+            Moments of observations in seconds.
+        magnitude : 1D numpy.array(dtype=float)
+            Observed magnitudes.
+
+        Returns
+        -------
+        prediction : 1D numpy.array(dtype=float)
+            Model magnitudes.
+        residual : 1D numpy.array(dtype=float)
+            Observed minus model magnitudes.
+
+        Raises
+        ------
+        ValueError
+            If any system isn't tracked.
+        """
+        if isinstance(keys, np.ndarray) and keys.dtype.kind in "iu":
+            index = keys.astype(np.intp)
+
+            if len(index) and (index.min() < 0
+                               or index.max() >= len(self.keys)):
+                raise ValueError("Rows of systems must be between 0 and "
+                                 "{0}".format(len(self.keys) - 1))
+        else:
+            index = self.indices(keys)
+
+        time = np.asarray(time, dtype=float)
+        magnitude = np.asarray(magnitude, dtype=float)
+        prediction = np.full(len(index), np.nan)
+        residual = np.full(len(index), np.nan)
+        valid = np.isfinite(time) & np.isfinite(magnitude)
+
+        if not np.all(valid):
+            np.add.at(self.state["rejected"], index[~valid], 1)
+            index = index[valid]
+            time = time[valid]
+            magnitude = magnitude[valid]
+
+        if len(index) == 0:
+            return prediction, residual
+
+        prediction[valid], mean_anomaly, eccentric_anomaly = self._predict(
+            index, time)
+        residual[valid] = magnitude - prediction[valid]
+
+        # Points are assigned in the order of time, so the last assignment
+        # to a row keeps the latest point of a system.
+        order = np.argsort(time, kind="stable")
+        self.state["mean_anomaly"][index[order]] = mean_anomaly[order]
+        self.state["eccentric_anomaly"][index[order]] = (
+            eccentric_anomaly[order])
+        self.state["last_time"][index[order]] = time[order]
+        self._update_statistics(index, residual[valid])
+
+        return prediction, residual
+
+    def _update_statistics(self, index, residual):
+        # Merge statistics of the batch with the running ones (Chan et al.
+        # formula), one row for each system in the batch.
+        rows, inverse = np.unique(index, return_inverse=True)
+        count = np.bincount(inverse).astype(float)
+        mean = np.bincount(inverse, weights=residual)/count
+        m2 = np.bincount(inverse, weights=(residual - mean[inverse])**2)
+        s = self.state[rows]
+        total = s["count"] + count
+        delta = mean - s["mean"]
+        s["m2"] += m2 + delta**2*s["count"]*count/total
+        s["mean"] += delta*count/total
+        s["count"] = total
+        self.state[rows] = s
+
+    def statistics(self, key):
+        """
+        Return statistics of residuals of a system.
+
+        Returns
+        -------
+        statistics : dict
+            count, mean, std of residuals, the time of the last point
+            and the number of rejected points.
+        """
+        s = self.state[self.indices([key])[0]]
+        count = int(s["count"])
+
+        return {"count": count, "mean": float(s["mean"]),
+                "std": float(np.sqrt(s["m2"]/count)) if count else 0.0,
+                "last_time": float(s["last_time"]),
+                "rejected": int(s["rejected"])}
+
+    def reset_statistics(self, key):
+        """Forget residuals of a system."""
+        index = self.indices([key])[0]
+        self.state["count"][index] = 0
+        self.state["mean"][index] = 0.0
+        self.state["m2"][index] = 0.0
+        self.state["rejected"][index] = 0
+
+
+class AsyncStreamMonitor:
+    """
+    AsyncStreamMonitor collects points submitted by coroutines into
+    micro-batches and updates a StreamMonitor once per batch.
+    """
+
+    def __init__(self, monitor, batch_size=4096, delay=0.005):
+        """
+        Parameters
+        ----------
+        monitor : StreamMonitor
+        batch_size : int
+            The maximum number of points in a batch. Default 4096.
+        delay : float
+            The longest time in seconds a point waits for other points
+            of its batch. Default 0.005.
+        """
+        self.monitor = monitor
+        self.batch_size = batch_size
+        self.delay = delay
+        self.batches = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        """Start collecting batches in the running event loop."""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._collect())
+
+        return self
+
+    async def submit(self, key, time, magnitude):
+        """Return the model magnitude and the residual of a point."""
+        if self._task is None:
+            raise RuntimeError("The monitor isn't started")
+
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((key, time, magnitude, future))
+
+        return await future
+
+    async def submit_many(self, keys, time, magnitude):
+        """Submit points at once and return arrays of results."""
+        results = await asyncio.gather(*[
+            self.submit(*point) for point in zip(keys, time, magnitude)])
+
+        return (np.array([result[0] for result in results]),
+                np.array([result[1] for result in results]))
+
+    async def close(self):
+        """Process waiting points and stop collecting batches."""
+        if self._task is None:
+            return
+
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def _collect(self):
+        loop = asyncio.get_event_loop()
+        running = True
+
+        while running:
+            points = [await self._queue.get()]
+            deadline = loop.time() + self.delay
+
+            while len(points) < self.batch_size:
+                if not self._queue.empty():
+                    points.append(self._queue.get_nowait())
+                    continue
+
+                timeout = deadline - loop.time()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    points.append(await asyncio.wait_for(self._queue.get(),
+                                                         timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            if None in points:
+                points = [point for point in points if point is not None]
+                running = False
+
+            if points:
+                self._process(points)
+
+    def _process(self, points):
+        # Invalid points fail only their own futures. Any other error
+        # is passed to all futures of the batch, so no caller waits
+        # forever and batches are still collected.
+        self.batches += 1
+        accepted = []
+
+        for key, time, magnitude, future in points:
+            try:
+                if key not in self.monitor:
+                    raise ValueError("The system {0} isn't tracked".format(
+                        key))
+
+                accepted.append((key, _to_float(time), _to_float(magnitude),
+                                 future))
+            except (TypeError, ValueError) as error:
+                _finish(future, error=error)
+
+        if not accepted:
+            return
+
+        keys, time, magnitude, futures = zip(*accepted)
+
+        try:
+            prediction, residual = self.monitor.update(keys, time, magnitude)
+        except Exception as error:
+            for future in futures:
+                _finish(future, error=error)
+            return
+
+        for future, result in zip(futures, zip(prediction.tolist(),
+                                               residual.tolist())):
+            _finish(future, result)
+
+
+def _to_float(value):
+    # None means a missing value, which update rejects as NaN.
+    return np.nan if value is None else float(value)
+
+
+def _finish(future, result=None, error=None):
+    if future.done():
+        return
+
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
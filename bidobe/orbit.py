@@ -7,10 +7,57 @@ and particular time t an Orbit2D object calculates position and velocity
 vectors. An Orbit3D object inherits from the Orbit2D object. For given
 angles it projects position on the sky and calculates a radial velocity.
 
+An OrbitFourierSeries object expands radial velocities and a light curve
+of a binary system into a truncated Fourier series of the mean anomaly.
+It evaluates them at any time without solving the Kepler equation.
+
 """
 from math import sqrt, pi, pow, radians, sin, cos, atan2, asin
+import numpy as np
 from scipy.optimize import fsolve
 from bidobe.astunit import UnitsConverter
+from bidobe.dobe import binary_brightness_curve
+
+
+def solve_kepler_equation_array(mean_anomaly, eccentricity,
+                                tolerance=1e-12, max_iterations=100):
+    """
+    Solve the Kepler equation for an array of mean anomalies using
+    the Newton method.
+
+    Parameters
+    ----------
+    mean_anomaly : numpy.array(dtype=float)
+        Mean anomalies in radians.
+    eccentricity : float or numpy.array(dtype=float)
+        Values of orbit's eccentricity between 0 and 1. An array is
+        broadcast against the mean anomalies.
+    tolerance : float
+        Maximum change of the eccentric anomaly in the last iteration.
+    max_iterations : int
+        Maximum number of iterations.
+
+    Returns
+    -------
+    eccentric_anomaly : numpy.array(dtype=float)
+        Eccentric anomalies in radians between 0 and 2*pi.
+    """
+    mean_anomaly = np.mod(np.asarray(mean_anomaly, dtype=float), 2*pi)
+    eccentricity = np.asarray(eccentricity, dtype=float)
+    eccentric_anomaly = np.where(
+        eccentricity < 0.8, mean_anomaly + eccentricity*np.sin(mean_anomaly),
+        pi)
+
+    for i in range(max_iterations):
+        step = ((eccentric_anomaly - eccentricity*np.sin(eccentric_anomaly)
+                 - mean_anomaly)
+                / (1 - eccentricity*np.cos(eccentric_anomaly)))
+        eccentric_anomaly -= step
+
+        if np.all(np.abs(step) < tolerance):
+            break
+
+    return eccentric_anomaly
 
 
 class Orbit2DParameters:
@@ -149,6 +196,17 @@ class Orbit2D(UnitsConverter):
 
         return velocity_angle
 
+    def calculate_true_anomalies(self, time):
+        """Calculate true anomalies in radians for an array of times."""
+        mean_anomaly = (2*pi*(np.asarray(time, dtype=float)
+                              - self.periastron_passage)/self.period)
+        eccentric_anomaly = solve_kepler_equation_array(mean_anomaly,
+                                                        self.eccentricity)
+        x = sqrt(1 - self.eccentricity)*np.cos(0.5*eccentric_anomaly)
+        y = sqrt(1 + self.eccentricity)*np.sin(0.5*eccentric_anomaly)
+
+        return np.mod(2*np.arctan2(y, x), 2*pi)
+
     def update(self, time):
         """Update x, y, v_x, v_y for particular time."""
         self.calculate_mean_anomaly(time)
@@ -220,19 +278,208 @@ class Orbit3D(Orbit2D):
 
         return self.projected_position
 
-    def calculate_radial_velocity(self):
-        """Calculate radial velocity in meters per second."""
+    def calculate_projected_positions(self, time):
+        """
+        Calculate x, y arrays in meters projected on the sky for an array
+        of times. It doesn't change the state of the object.
+        """
+        true_anomaly = self.calculate_true_anomalies(time)
+        semilatus_rectum = self.semi_major_axis*(1 - pow(self.eccentricity, 2))
+        distance = (semilatus_rectum
+                    / (1 + self.eccentricity*np.cos(true_anomaly)))
+        x_rot, y_rot = self.rotate_coordinate_system(
+            distance*np.cos(true_anomaly), distance*np.sin(true_anomaly),
+            self.periastron_argument)
+
+        return self.rotate_coordinate_system(
+            x_rot, y_rot*cos(self.inclination), self.longitude_node)
+
+    def calculate_radial_velocity_amplitude(self):
+        """Calculate the semi-amplitude K in meters per second."""
         K = 2*pi*self.semi_major_axis*sin(self.inclination)
         K /= self.period*sqrt(1 - pow(self.eccentricity, 2))
 
+        return K
+
+    def calculate_radial_velocity(self):
+        """Calculate radial velocity in meters per second."""
+        K = self.calculate_radial_velocity_amplitude()
+
         self.radial_velocity = K*(
             cos(self.periastron_argument + self.true_anomaly)
             + self.eccentricity*cos(self.periastron_argument))
 
         return self.radial_velocity
 
+    def calculate_radial_velocities(self, time):
+        """
+        Calculate radial velocities in meters per second for an array
+        of times. It doesn't change the state of the object.
+        """
+        K = self.calculate_radial_velocity_amplitude()
+        true_anomaly = self.calculate_true_anomalies(time)
+
+        return K*(np.cos(self.periastron_argument + true_anomaly)
+                  + self.eccentricity*cos(self.periastron_argument))
+
     def update(self, time):
         """Update x, y projected on the sky and radial velocity."""
         Orbit2D.update(self, time)
         self.calculate_projected_position()
         self.calculate_radial_velocity()
+
+
+class OrbitFourierSeries:
+    """
+    OrbitFourierSeries represents radial velocities and a light curve
+    of a binary system as truncated Fourier series of the mean anomaly:
+
+        f(M) = Re(c_0 + c_1*exp(iM) + ... + c_n*exp(inM))
+
+    The number of terms is chosen for each curve separately to reach
+    the requested accuracy.
+    """
+
+    VERSION = 1
+
+    def __init__(self, period, periastron_passage, coefficients):
+        """
+        Parameters
+        ----------
+        period : float
+            The orbital period in seconds.
+        periastron_passage : float
+            A moment when a star passes periastron in seconds.
+        coefficients : dict
+            Complex coefficients c_0, ..., c_n of each curve. Available
+            curves: velocity1, velocity2 and optionally magnitude.
+        """
+        self.period = period
+        self.periastron_passage = periastron_passage
+        self.coefficients = dict(
+            (name, np.asarray(values, dtype=complex))
+            for name, values in coefficients.items())
+
+    @classmethod
+    def from_orbits(cls, orbit1, orbit2, object1=None, object2=None,
+                    tolerance=1e-6, max_terms=4096, zero_level=16.0):
+        """
+        Expand curves of a binary system into Fourier series.
+
+        Parameters
+        ----------
+        orbit1, orbit2 : Orbit3D
+            Orbits of both objects in the binary system.
+        object1, object2 : OrbitingObject
+            Objects in the binary system. If given the light curve is
+            expanded too.
+        tolerance : float
+            The maximum error of each curve relative to its semi-amplitude.
+            Default 1e-6.
+        max_terms : int
+            The maximum number of terms of each series. Default 4096.
+        zero_level : float
+            The zero level of the light curve. Default 16.0.
+        """
+        coefficients = {}
+        samples = 64
+
+        while True:
+            mean_anomaly = 2*pi*np.arange(samples)/samples
+            time = (orbit1.periastron_passage
+                    + orbit1.period*mean_anomaly/(2*pi))
+            curves = {"velocity1": orbit1.calculate_radial_velocities(time),
+                      "velocity2": orbit2.calculate_radial_velocities(time)}
+
+            if object1 is not None and object2 is not None:
+                curves["magnitude"] = binary_brightness_curve(
+                    object1, object2, curves["velocity1"],
+                    curves["velocity2"], zero_level)
+
+            for name, values in curves.items():
+                if name not in coefficients:
+                    series = _truncated_series(values, tolerance)
+
+                    if series is not None and len(series) <= samples//4:
+                        coefficients[name] = series
+
+            if len(coefficients) == len(curves):
+                break
+            elif samples >= 4*max_terms:
+                raise ValueError("The tolerance {0} can't be reached with "
+                                 "{1} terms".format(tolerance, max_terms))
+
+            samples *= 2
+
+        return cls(orbit1.period, orbit1.periastron_passage, coefficients)
+
+    def number_of_terms(self, curve):
+        """Return the number of harmonics in the series of the curve."""
+        return len(self.coefficients[curve]) - 1
+
+    def evaluate(self, time, curve="magnitude"):
+        """
+        Evaluate a curve for an array of times in seconds.
+
+        Parameters
+        ----------
+        time : numpy.array(dtype=float)
+            Array represents time.
+        curve : str
+            One of: velocity1, velocity2, magnitude.
+        """
+        mean_anomaly = (2*pi*(np.asarray(time, dtype=float)
+                              - self.periastron_passage)/self.period)
+        z = np.exp(1j*mean_anomaly)
+        coefficients = self.coefficients[curve]
+        value = np.full_like(z, coefficients[-1])
+
+        # Horner's scheme for the polynomial of z = exp(iM).
+        for c in coefficients[-2::-1]:
+            value *= z
+            value += c
+
+        return value.real
+
+    def to_dict(self):
+        """Return a JSON serializable representation of the series."""
+        return {
+            "version": self.VERSION,
+            "period": self.period,
+            "periastron_passage": self.periastron_passage,
+            "coefficients": dict(
+                (name, [values.real.tolist(), values.imag.tolist()])
+                for name, values in self.coefficients.items())}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create the series from a representation made by to_dict."""
+        if data["version"] != cls.VERSION:
+            raise ValueError("Unsupported version: {0}".format(
+                data["version"]))
+
+        coefficients = dict(
+            (name, np.array(real) + 1j*np.array(imag))
+            for name, (real, imag) in data["coefficients"].items())
+
+        return cls(data["period"], data["periastron_passage"], coefficients)
+
+
+def _truncated_series(values, tolerance):
+    samples = len(values)
+    coefficients = np.fft.rfft(values)/samples
+    coefficients[1:] *= 2
+    coefficients = coefficients[:samples//2]
+    amplitude = np.abs(values - coefficients[0].real).max()
+
+    if amplitude == 0:
+        return coefficients[:1]
+
+    # The sum of the omitted terms is an upper limit of the error.
+    tail = np.cumsum(np.abs(coefficients[::-1]))[::-1]
+    sufficient = np.nonzero(tail <= tolerance*amplitude)[0]
+
+    if len(sufficient) == 0:
+        return None
+
+    return coefficients[:max(sufficient[0], 1)]
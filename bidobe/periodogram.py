@@ -0,0 +1,233 @@
+"""
+Detect the doppler beaming in light curves with the Lomb-Scargle
+periodogram.
+
+The periodogram is computed in O(N log N) time with the method of Press
+and Rybicki (1989, ApJ 338, 277): data are extirpolated onto a regular
+grid and trigonometric sums are calculated with the FFT. Observations can
+be irregular. Many curves observed at the same moments are computed
+at once.
+
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def frequency_grid(time, samples_per_peak=5, maximum_frequency=None):
+    """
+    Choose a regular grid of frequencies for a periodogram.
+
+    Parameters
+    ----------
+    time : 1D numpy.array(dtype=float)
+        Moments of observations.
+    samples_per_peak : int
+        The number of frequencies per width of a peak. Default 5.
+    maximum_frequency : float
+        The highest frequency. Default half of the mean sampling rate.
+
+    Returns
+    -------
+    frequency : 1D numpy.array(dtype=float)
+        Frequencies equal to step, 2*step, ..., maximum_frequency.
+    """
+    time = np.asarray(time, dtype=float)
+    baseline = time.max() - time.min()
+    step = 1.0/(samples_per_peak*baseline)
+
+    if maximum_frequency is None:
+        maximum_frequency = 0.5*len(time)/baseline
+
+    return step*np.arange(1, int(maximum_frequency/step) + 1)
+
+
+def lomb_scargle(time, values, frequency_step, frequencies_number,
+                 oversampling=5, order=4):
+    """
+    Calculate the Lomb-Scargle periodogram with the fast algorithm for
+    frequencies: step, 2*step, ..., frequencies_number*step.
+
+    Parameters
+    ----------
+    time : 1D numpy.array(dtype=float)
+        Moments of observations.
+    values : numpy.array(shape=(len(time),) or (*, len(time)), dtype=float)
+        Observed values. Each row is a separate curve.
+    frequency_step : float
+        The step of the frequency grid in the inverse unit of time.
+    frequencies_number : int
+        The number of frequencies.
+    oversampling : int
+        The number of grid points per frequency in the FFT. Default 5.
+    order : int
+        The number of grid points to extirpolate each value. Default 4.
+
+    Returns
+    -------
+    frequency : 1D numpy.array(dtype=float)
+    power : numpy.array(dtype=float)
+        The normalized power between 0 and 1 for each curve.
+    """
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values, dtype=float)
+    curves = np.atleast_2d(values)
+    centered = curves - curves.mean(axis=1)[:, np.newaxis]
+    size = len(time)
+    weight = np.full(size, 1.0/size)
+
+    spread = _extirpolation_matrix(time, frequency_step, frequencies_number,
+                                   oversampling, order, 1)
+    spread2 = _extirpolation_matrix(time, frequency_step, frequencies_number,
+                                    oversampling, order, 2)
+    sin_y, cos_y = _trig_sums(spread, centered*weight, frequencies_number)
+    sin_2, cos_2 = _trig_sums(spread2, weight[np.newaxis, :],
+                              frequencies_number)
+    power = _normalized_power(sin_y, cos_y, sin_2[0], cos_2[0],
+                              np.sum(weight*centered**2, axis=1))
+    frequency = frequency_step*np.arange(1, frequencies_number + 1)
+
+    if values.ndim == 1:
+        power = power[0]
+
+    return frequency, power
+
+
+def lomb_scargle_at(time, values, frequency):
+    """
+    Calculate the Lomb-Scargle periodogram directly for a few frequencies.
+
+    Parameters
+    ----------
+    time : 1D numpy.array(dtype=float)
+        Moments of observations.
+    values : numpy.array(shape=(len(time),) or (*, len(time)), dtype=float)
+        Observed values. Each row is a separate curve.
+    frequency : 1D numpy.array(dtype=float)
+        Frequencies in the inverse unit of time.
+    """
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values, dtype=float)
+    curves = np.atleast_2d(values)
+    centered = curves - curves.mean(axis=1)[:, np.newaxis]
+    weight = 1.0/len(time)
+    angle = 2*np.pi*np.outer(np.atleast_1d(frequency), time)
+    sin_y = np.dot(centered*weight, np.sin(angle).T)
+    cos_y = np.dot(centered*weight, np.cos(angle).T)
+    sin_2 = weight*np.sin(2*angle).sum(axis=1)
+    cos_2 = weight*np.cos(2*angle).sum(axis=1)
+    power = _normalized_power(sin_y, cos_y, sin_2, cos_2,
+                              np.sum(weight*centered**2, axis=1))
+
+    if values.ndim == 1:
+        power = power[0]
+
+    return power
+
+
+def false_alarm_probability(power, points, frequencies=1):
+    """
+    Calculate the probability that the power of pure Gaussian noise
+    exceeds a given value.
+
+    Parameters
+    ----------
+    power : float or numpy.array(dtype=float)
+        The normalized power.
+    points : int
+        The number of observations.
+    frequencies : float
+        The number of independent frequencies searched. For a known
+        period (e.g. the orbital one) it is 1. Default 1.
+    """
+    probability = np.power(1.0 - np.asarray(power), 0.5*(points - 3))
+
+    if frequencies == 1:
+        return probability
+
+    return -np.expm1(frequencies*np.log1p(-probability))
+
+
+def beaming_detection(time, magnitude, period, harmonics=3):
+    """
+    Check whether the doppler beaming is detectable at the orbital period
+    and its harmonics.
+
+    Parameters
+    ----------
+    time : 1D numpy.array(dtype=float)
+        Moments of observations.
+    magnitude : numpy.array(shape=(len(time),) or (*, len(time)))
+        Light curves, e.g. made by the binary_brightness function.
+    period : float
+        The orbital period in the same unit as time (see Orbit2D.period).
+    harmonics : int
+        The number of tested frequencies: 1/period, 2/period, ...
+        Default 3.
+
+    Returns
+    -------
+    detection : dict
+        frequency : 1D numpy.array(shape=(harmonics,))
+        power : the normalized power at each frequency
+        false_alarm_probability : the probability that noise gives higher
+            power at each frequency
+    """
+    frequency = np.arange(1, harmonics + 1)/float(period)
+    power = lomb_scargle_at(time, magnitude, frequency)
+
+    return {"frequency": frequency, "power": power,
+            "false_alarm_probability": false_alarm_probability(
+                power, len(time))}
+
+
+def _extirpolation_matrix(time, frequency_step, frequencies_number,
+                          oversampling, order, factor):
+    # Spread each moment of observation onto the `order` nearest points
+    # of a regular grid with the Lagrange interpolation weights. Sums
+    # of exp(2*pi*i*f*t) become an FFT of the grid.
+    grid_size = 1 << int(np.ceil(np.log2(
+        max(factor*frequencies_number*oversampling, order))))
+    step = factor*frequency_step
+    start = time.min()
+    position = ((time - start)*grid_size*step) % grid_size
+    lowest = np.clip(np.floor(position).astype(int) - order//2 + 1,
+                     0, grid_size - order)
+    rows = lowest[:, np.newaxis] + np.arange(order)
+    weights = np.ones((len(time), order))
+    integer = position == np.round(position)
+
+    for m in range(order):
+        for n in range(order):
+            if n != m:
+                weights[:, m] *= (position - lowest - n)/(m - n)
+
+    weights[integer] = (rows[integer] == position[integer, np.newaxis])
+    columns = np.repeat(np.arange(len(time)), order)
+    matrix = csr_matrix((weights.ravel(), (rows.ravel(), columns)),
+                        shape=(grid_size, len(time)))
+
+    return matrix, start, step, grid_size
+
+
+def _trig_sums(spread, values, frequencies_number):
+    matrix, start, step, grid_size = spread
+    grid = matrix.dot(values.T).T
+    sums = grid_size*np.fft.ifft(grid, axis=1)[:, 1:frequencies_number + 1]
+    sums *= np.exp(2j*np.pi*start*step*np.arange(1, frequencies_number + 1))
+
+    return sums.imag, sums.real
+
+
+def _normalized_power(sin_y, cos_y, sin_2, cos_2, variance):
+    hypot = np.hypot(sin_2, cos_2)
+    hypot[hypot == 0] = 1.0
+    cos_2w = cos_2/hypot
+    sin_2w = sin_2/hypot
+    cos_w = np.sqrt(0.5*(1 + cos_2w))
+    sin_w = np.sign(sin_2w)*np.sqrt(0.5*(1 - cos_2w))
+    yc = cos_y*cos_w + sin_y*sin_w
+    ys = sin_y*cos_w - cos_y*sin_w
+    cc = 0.5*(1 + cos_2*cos_2w + sin_2*sin_2w)
+    ss = 0.5*(1 - cos_2*cos_2w - sin_2*sin_2w)
+
+    return (yc*yc/cc + ys*ys/ss)/variance[:, np.newaxis]
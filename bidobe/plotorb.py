@@ -4,12 +4,30 @@ Save to file, plot or animate on the screen:
   2. radial velocities of each component of the binary system
   3. a light curve caused by the doppler beaming
 
+Figures of many systems can be exported at once with export_figures.
+
+Curves with more samples than pixels are decimated before plotting: for
+each bucket of consecutive samples only the extreme values are kept, so
+the image looks the same but renders much faster. Orbits, which retrace
+themselves every period, are decimated in pixels: repeated segments
+between the same pixels are drawn once.
+
 """
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from bidobe.profiling import profile_stage
 
 
-def plot_projected_orbits(orbit1, orbit2, xunit="m", yunit="m", filename=None):
+def plot_projected_orbits(orbit1, orbit2, xunit="m", yunit="m", filename=None,
+                          decimate=True):
     """
     Plot orbits of a binary system projected on the sky. Position
     expressed in XY coordinate system.
@@ -26,12 +44,15 @@ def plot_projected_orbits(orbit1, orbit2, xunit="m", yunit="m", filename=None):
         The name of a file where the image will be saved to.
         It should have the .eps extenstion. If None the image
         will be only displayed on a screen.
+    decimate : bool
+        Keep only samples which enter or leave a pixel. Default True.
     """
-    figure = _projected_orbits(orbit1, orbit2, xunit, yunit)
+    figure = _projected_orbits(orbit1, orbit2, xunit, yunit, decimate)
     _display_or_save_figure(figure, filename)
 
 
-def animate_projected_orbits(orbit1, orbit2, xunit="m", yunit="m"):
+def animate_projected_orbits(orbit1, orbit2, xunit="m", yunit="m",
+                             filename=None, stride=1, workers=1, fps=30):
     """
     Animate orbiting objects of a binary system projected on the sky.
     Position expressed in XY coordinate system.
@@ -44,13 +65,30 @@ def animate_projected_orbits(orbit1, orbit2, xunit="m", yunit="m"):
     xunit, yunit : str
         String which is x/y's label on an image.
         Default set in meters.
+    filename : str
+        If given the animation is rendered offline without a display:
+        a directory (PNG frames), a .gif file or any video file which
+        ffmpeg can write. If None the animation is shown on a screen.
+    stride : int
+        Use every stride-th sample as a frame. Default 1.
+    workers : int
+        The number of processes rendering frames offline. Default 1.
+    fps : int
+        Frames per second of a .gif or a video file. Default 30.
     """
+    if filename:
+        _render_animation("orbits", (orbit1, orbit2, xunit, yunit),
+                          np.column_stack((orbit1[:, 0], orbit2[:, 0])),
+                          np.column_stack((orbit1[:, 1], orbit2[:, 1])),
+                          filename, stride, workers, fps)
+        return
+
     figure = _projected_orbits(orbit1, orbit2, xunit, yunit)
-    animation = _anim_projected_orbits(figure, orbit1, orbit2)
+    animation = _anim_projected_orbits(figure, orbit1, orbit2, stride)
     _display_or_save_figure(figure, None)
 
 
-def _projected_orbits(orbit1, orbit2, xunit, yunit):
+def _projected_orbits(orbit1, orbit2, xunit, yunit, decimate=True):
     figure = plt.figure()
     ax = figure.add_subplot(111)
     ax.set_aspect('equal')
@@ -71,14 +109,20 @@ def _projected_orbits(orbit1, orbit2, xunit, yunit):
     ax.set_ylim(yran)
     ax.annotate("W", (arrow_length, 0.05*arrow_length))
     ax.annotate("N", (0.05*arrow_length, arrow_length))
-    plt.plot(orbit1[:, 0], orbit1[:, 1], 'r-', linewidth=0.5)
-    plt.plot(orbit2[:, 0], orbit2[:, 1], 'b-', linewidth=0.5)
+    for orbit, style in ((orbit1, 'r-'), (orbit2, 'b-')):
+        x, y = orbit[:, 0], orbit[:, 1]
+
+        if decimate:
+            x, y = _decimate_path(figure, ax, x, y)
+
+        plt.plot(x, y, style, linewidth=0.5)
+
     plt.tight_layout()
 
     return figure
 
 
-def _anim_projected_orbits(figure, orbit1, orbit2):
+def _anim_projected_orbits(figure, orbit1, orbit2, stride=1):
     line, = plt.plot(orbit1[:, 0], orbit1[:, 1], 'ko', animated=True)
 
     def _update_positions(i):
@@ -91,7 +135,8 @@ def _anim_projected_orbits(figure, orbit1, orbit2):
         return line,
 
     animation = FuncAnimation(figure, _update_positions,
-                              frames=range(len(orbit1)), interval=1, blit=True)
+                              frames=range(0, len(orbit1), stride),
+                              interval=1, blit=True)
 
     return animation
 
@@ -143,6 +188,90 @@ def _choose_greater_range(first_min, first_max, second_min, second_max):
         return second_min, second_max
 
 
+def _decimate(figure, *columns):
+    """
+    Split samples into as many buckets as the figure has pixels in width
+    and keep the first, the last and the extreme values of each column
+    in every bucket. The order of samples is preserved.
+    """
+    columns = [np.asarray(column) for column in columns]
+    size = len(columns[0])
+    buckets = int(figure.get_size_inches()[0]*figure.dpi)
+    bucket_size = -(-size//buckets)
+
+    if bucket_size < 2*len(columns) + 1:
+        return columns
+
+    buckets = -(-size//bucket_size)
+    padding = buckets*bucket_size - size
+    start = np.arange(buckets)*bucket_size
+    indices = [start, np.append(start[1:] - 1, size - 1)]
+
+    for column in columns:
+        padded = np.pad(column, (0, padding), mode='edge')
+        padded = padded.reshape(buckets, bucket_size)
+        indices.append(start + padded.argmin(axis=1))
+        indices.append(start + padded.argmax(axis=1))
+
+    indices = np.unique(np.concatenate(indices))
+
+    return [column[indices] for column in columns]
+
+
+def _decimate_path(figure, ax, x, y):
+    """
+    Decimate an x-y path in pixels of the current limits of axes. Samples
+    which don't enter or leave a pixel are dropped, then segments between
+    pixels which are already joined are skipped and the path is broken
+    with NaN. Unlike _decimate it works for paths which retrace themselves,
+    e.g. orbits covering many periods, and the drawn path stays within
+    about a pixel of the original one.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    if len(x) < 3:
+        return x, y
+
+    width, height = figure.get_size_inches()*figure.dpi
+    pixels = []
+
+    for values, limits, size in ((x, ax.get_xlim(), width),
+                                 (y, ax.get_ylim(), height)):
+        scale = abs(limits[1] - limits[0])/size
+
+        if scale == 0:
+            return x, y
+
+        pixels.append(np.floor((values - min(limits))/scale).astype(np.int64))
+
+    moved = (np.diff(pixels[0]) != 0) | (np.diff(pixels[1]) != 0)
+    keep = np.ones(len(x), dtype=bool)
+    keep[1:-1] = moved[:-1] | moved[1:]
+    x, y = x[keep], y[keep]
+    column, row = pixels[0][keep], pixels[1][keep]
+    cell = (column - column.min())*(row.max() - row.min() + 1) + (
+        row - row.min())
+    pairs = np.sort(np.column_stack((cell[:-1], cell[1:])), axis=1)
+    first = np.zeros(len(pairs), dtype=bool)
+    first[np.unique(pairs, axis=0, return_index=True)[1]] = True
+    edges = np.flatnonzero(first)
+
+    # Each kept segment adds its first point. The last segment of a run
+    # of consecutive ones adds also its end and a break.
+    last = np.append(np.diff(edges) != 1, True)
+    counts = 1 + 2*last
+    indices = np.repeat(edges, counts)
+    offset = np.arange(len(indices)) - np.repeat(np.cumsum(counts) - counts,
+                                                 counts)
+    indices += offset == 1
+    x, y = x[indices], y[indices]
+    x[offset == 2] = np.nan
+    y[offset == 2] = np.nan
+
+    return x[:-1], y[:-1]
+
+
 def _display_or_save_figure(figure, filename=None):
     if filename:
         figure.savefig(filename, format="eps", bbox_inches=None)
@@ -151,7 +280,8 @@ def _display_or_save_figure(figure, filename=None):
 
 
 def plot_radial_velocities(time, velocity1, velocity2,
-                           xunit="s", yunit="m/s", filename=None):
+                           xunit="s", yunit="m/s", filename=None,
+                           decimate=True):
     """
     Plot radial velocities of a binary system.
 
@@ -171,13 +301,18 @@ def plot_radial_velocities(time, velocity1, velocity2,
         The name of a file where the image will be saved to.
         It should have the .eps extenstion. If None the image
         will be only displayed on a screen.
+    decimate : bool
+        Keep only extreme points of each pixel-wide bucket of samples.
+        Default True.
     """
-    figure = _radial_velocities(time, velocity1, velocity2, xunit, yunit)
+    figure = _radial_velocities(time, velocity1, velocity2, xunit, yunit,
+                                decimate)
     _display_or_save_figure(figure, filename)
 
 
 def animate_radial_velocities(time, velocity1, velocity2,
-                              xunit="s", yunit="m/s"):
+                              xunit="s", yunit="m/s", filename=None,
+                              stride=1, workers=1, fps=30):
     """
     Animate radial velocities of a binary system.
 
@@ -193,27 +328,51 @@ def animate_radial_velocities(time, velocity1, velocity2,
     yunit : str
         String which is y's label on the image.
         Default set in meters per second.
+    filename : str
+        If given the animation is rendered offline without a display:
+        a directory (PNG frames), a .gif file or any video file which
+        ffmpeg can write. If None the animation is shown on a screen.
+    stride : int
+        Use every stride-th sample as a frame. Default 1.
+    workers : int
+        The number of processes rendering frames offline. Default 1.
+    fps : int
+        Frames per second of a .gif or a video file. Default 30.
     """
+    if filename:
+        _render_animation("velocities",
+                          (time, velocity1, velocity2, xunit, yunit),
+                          np.column_stack((time, time)),
+                          np.column_stack((velocity1, velocity2)),
+                          filename, stride, workers, fps)
+        return
+
     figure = _radial_velocities(time, velocity1, velocity2, xunit, yunit)
-    animation = _anim_radial_velocities(figure, time, velocity1, velocity2)
+    animation = _anim_radial_velocities(figure, time, velocity1, velocity2,
+                                        stride)
     _display_or_save_figure(figure, None)
 
 
-def _radial_velocities(time, velocity1, velocity2, xunit="s", yunit="m/s"):
+def _radial_velocities(time, velocity1, velocity2, xunit="s", yunit="m/s",
+                       decimate=True):
     figure = plt.figure()
     ax = figure.add_subplot(111)
     ax.grid(color='gray', linestyle='--', linewidth=0.2)
     plt.xlabel('Time (' + xunit + ')')
     plt.ylabel(r'$V_{rad}$' + ' (' + yunit + ')')
     plt.title('Radial velocities')
-    plt.plot(time, velocity1, 'r-', linewidth=0.5)
-    plt.plot(time, velocity2, 'b-', linewidth=0.5)
+    for velocity, style in ((velocity1, 'r-'), (velocity2, 'b-')):
+        if decimate:
+            plt.plot(*_decimate(figure, time, velocity), style, linewidth=0.5)
+        else:
+            plt.plot(time, velocity, style, linewidth=0.5)
+
     plt.tight_layout()
 
     return figure
 
 
-def _anim_radial_velocities(figure, time, velocity1, velocity2):
+def _anim_radial_velocities(figure, time, velocity1, velocity2, stride=1):
     line, = plt.plot(time, velocity1, 'ko', animated=True)
 
     def _current_velocities(i):
@@ -225,12 +384,14 @@ def _anim_radial_velocities(figure, time, velocity1, velocity2):
         return line,
 
     animation = FuncAnimation(figure, _current_velocities,
-                              frames=range(len(time)), interval=1, blit=True)
+                              frames=range(0, len(time), stride),
+                              interval=1, blit=True)
 
     return animation
 
 
-def plot_light_curve(time, magnitude, xunit="s", filename=None):
+def plot_light_curve(time, magnitude, xunit="s", filename=None,
+                     decimate=True):
     """
     Plot light curve caused by the doppler beaming in a binary system.
 
@@ -247,12 +408,16 @@ def plot_light_curve(time, magnitude, xunit="s", filename=None):
         The name of a file where the image will be saved to.
         It should have the .eps extenstion. If None the image
         will be only displayed on a screen.
+    decimate : bool
+        Keep only extreme points of each pixel-wide bucket of samples.
+        Default True.
     """
-    figure = _light_curve(time, magnitude, xunit)
+    figure = _light_curve(time, magnitude, xunit, decimate)
     _display_or_save_figure(figure, filename)
 
 
-def animate_light_curve(time, magnitude, xunit="s"):
+def animate_light_curve(time, magnitude, xunit="s", filename=None,
+                        stride=1, workers=1, fps=30):
     """
     Animate light curve caused by the doppler beaming in a binary system.
 
@@ -265,13 +430,30 @@ def animate_light_curve(time, magnitude, xunit="s"):
     xunit : str
         String which is x's label on the image.
         Default set in seconds.
+    filename : str
+        If given the animation is rendered offline without a display:
+        a directory (PNG frames), a .gif file or any video file which
+        ffmpeg can write. If None the animation is shown on a screen.
+    stride : int
+        Use every stride-th sample as a frame. Default 1.
+    workers : int
+        The number of processes rendering frames offline. Default 1.
+    fps : int
+        Frames per second of a .gif or a video file. Default 30.
     """
+    if filename:
+        _render_animation("light_curve", (time, magnitude, xunit),
+                          np.column_stack((time,)),
+                          np.column_stack((magnitude,)),
+                          filename, stride, workers, fps)
+        return
+
     figure = _light_curve(time, magnitude, xunit)
-    animation = _anim_light_curve(figure, time, magnitude)
+    animation = _anim_light_curve(figure, time, magnitude, stride)
     _display_or_save_figure(figure, None)
 
 
-def _light_curve(time, magnitude, xunit):
+def _light_curve(time, magnitude, xunit, decimate=True):
     figure = plt.figure()
     ax = figure.add_subplot(111)
     ax.grid(color='gray', linestyle='--', linewidth=0.2)
@@ -279,13 +461,16 @@ def _light_curve(time, magnitude, xunit):
     plt.ylabel('Brightness (mag)')
     plt.title('Light curve')
     plt.gca().invert_yaxis()
+    if decimate:
+        time, magnitude = _decimate(figure, time, magnitude)
+
     plt.plot(time, magnitude, 'g-', linewidth=0.5)
     plt.tight_layout()
 
     return figure
 
 
-def _anim_light_curve(figure, time, magnitude):
+def _anim_light_curve(figure, time, magnitude, stride=1):
     line, = plt.plot(time, magnitude, 'ko', animated=True)
 
     def _current_magnitude(i):
@@ -296,6 +481,335 @@ def _anim_light_curve(figure, time, magnitude):
         return line,
 
     animation = FuncAnimation(figure, _current_magnitude,
-                              frames=range(len(time)), interval=1, blit=True)
+                              frames=range(0, len(time), stride),
+                              interval=1, blit=True)
 
     return animation
+
+
+FRAME_NAME = "frame_{0:06d}.png"
+
+
+def _render_animation(kind, arguments, marker_x, marker_y, filename,
+                      stride, workers, fps):
+    """
+    Render frames of an animation to PNG files, optionally in parallel,
+    and encode them into a .gif or a video file if filename isn't
+    a directory.
+    """
+    frames = np.arange(0, len(marker_x), stride)
+    video = os.path.splitext(filename)[1] != ""
+
+    if video:
+        directory = tempfile.mkdtemp()
+    else:
+        directory = filename
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    batches = [batch for batch in np.array_split(
+        np.arange(len(frames)), max(workers, 1)) if len(batch)]
+    tasks = [(kind, arguments, marker_x[frames[batch]],
+              marker_y[frames[batch]], batch, directory)
+             for batch in batches]
+
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(_render_frames, tasks))
+        else:
+            for task in tasks:
+                _render_frames(task)
+
+        if video:
+            _encode_frames(directory, len(frames), filename, fps)
+    finally:
+        if video:
+            shutil.rmtree(directory)
+
+
+def _render_frames(task):
+    # Static artists are drawn once per batch. Each frame restores
+    # the background and draws only the moving markers.
+    from PIL import Image
+
+    kind, arguments, marker_x, marker_y, numbers, directory = task
+    builders = {"orbits": _projected_orbits,
+                "velocities": _radial_velocities,
+                "light_curve": _light_curve}
+    figure = builders[kind](*arguments)
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.axes[0]
+    line, = ax.plot([], [], 'ko', animated=True)
+    canvas.draw()
+    background = canvas.copy_from_bbox(figure.bbox)
+
+    for number, x, y in zip(numbers, marker_x, marker_y):
+        canvas.restore_region(background)
+        line.set_data(x, y)
+        ax.draw_artist(line)
+        image = Image.fromarray(np.asarray(canvas.buffer_rgba()))
+        image.convert("RGB").save(
+            os.path.join(directory, FRAME_NAME.format(number)),
+            compress_level=1)
+
+    plt.close(figure)
+
+
+def _encode_frames(directory, frames_number, filename, fps):
+    gif = filename.lower().endswith(".gif")
+
+    if gif and shutil.which("ffmpeg") is None:
+        _encode_gif(directory, frames_number, filename, fps)
+        return
+
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is required to write {0}".format(filename))
+
+    if gif:
+        filters = "split[a][b];[a]palettegen[p];[b][p]paletteuse"
+        options = []
+    else:
+        filters = "pad=ceil(iw/2)*2:ceil(ih/2)*2"
+        options = ["-pix_fmt", "yuv420p"]
+
+    subprocess.check_call([
+        "ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps),
+        "-i", os.path.join(directory, "frame_%06d.png"), "-vf", filters]
+        + options + [filename])
+
+
+def _encode_gif(directory, frames_number, filename, fps):
+    # Without ffmpeg frames are passed to Pillow one by one, so only
+    # a single file is open at a time.
+    from PIL import Image
+
+    def _frames(start):
+        for i in range(start, frames_number):
+            with Image.open(os.path.join(directory,
+                                         FRAME_NAME.format(i))) as frame:
+                frame.load()
+                yield frame
+
+    with Image.open(os.path.join(directory, FRAME_NAME.format(0))) as first:
+        first.save(filename, save_all=True, append_images=_frames(1),
+                   duration=int(1000/fps), loop=0)
+
+
+FIGURE_KINDS = ("orbits", "velocities", "light_curve")
+
+
+def export_figures(systems, directory, kinds=FIGURE_KINDS, fmt="png",
+                   workers=1, position_unit="m", time_unit="s",
+                   velocity_unit="m/s", dpi=100, decimate=True):
+    """
+    Save figures of many binary systems without a display. Each process
+    creates a figure for each kind only once and then replaces its data.
+
+    PNG images are drawn once and saved from the buffer of the canvas.
+    If the limits of axes don't change between consecutive systems,
+    the background is reused and only the curves are drawn. Each full
+    draw lays out the ticks again and takes tens of milliseconds, so
+    systems with different limits are exported at tens of figures per
+    second and process, not hundreds; use several workers for more.
+
+    Parameters
+    ----------
+    systems : sequence of dict
+        Each dictionary has the keys: name, time, orbit1, orbit2,
+        velocity1, velocity2, magnitude (see plot_projected_orbits,
+        plot_radial_velocities and plot_light_curve). Only keys needed
+        by the requested kinds are required.
+    directory : str
+        Figures are saved as directory/<name>_<kind>.<fmt>.
+    kinds : sequence of str
+        Any of: orbits, velocities, light_curve. Default all.
+    fmt : str
+        Any format supported by matplotlib, e.g. png, pdf, svg, eps.
+        Default png.
+    workers : int
+        The number of processes. Default 1.
+    position_unit, time_unit, velocity_unit : str
+        Labels of units on figures.
+    dpi : int
+        Resolution of raster images. Default 100.
+    decimate : bool
+        Decimate long curves, see plot_light_curve. Default True.
+
+    Returns
+    -------
+    filenames : list of str
+        Names of saved files.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    systems = list(systems)
+    options = (directory, tuple(kinds), fmt, position_unit, time_unit,
+               velocity_unit, dpi, decimate)
+    chunks = [systems[i::max(workers, 1)] for i in range(max(workers, 1))]
+    tasks = [(chunk, options) for chunk in chunks if chunk]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_export_chunk, tasks))
+    else:
+        results = [_export_chunk(task) for task in tasks]
+
+    return [filename for result in results for filename in result]
+
+
+def _export_chunk(task):
+    systems, options = task
+    (directory, kinds, fmt, position_unit, time_unit, velocity_unit,
+     dpi, decimate) = options
+    templates = {
+        "orbits": _FigureTemplate("orbits", position_unit, position_unit,
+                                  dpi, decimate),
+        "velocities": _FigureTemplate("velocities", time_unit,
+                                      velocity_unit, dpi, decimate),
+        "light_curve": _FigureTemplate("light_curve", time_unit, "mag",
+                                       dpi, decimate)}
+    filenames = []
+
+    for system in systems:
+        for kind in kinds:
+            filename = os.path.join(directory, "{0}_{1}.{2}".format(
+                system["name"], kind, fmt))
+            with profile_stage("figure", kind=kind, system=system["name"]):
+                templates[kind].update(system)
+                templates[kind].save(filename, fmt)
+
+            filenames.append(filename)
+
+    for template in templates.values():
+        template.close()
+
+    return filenames
+
+
+class _FigureTemplate:
+    """
+    _FigureTemplate keeps a figure with labels, grid and lines of one kind
+    and replaces only data of the lines for each system.
+    """
+
+    def __init__(self, kind, xunit, yunit, dpi, decimate):
+        self.kind = kind
+        self.decimate = decimate
+        self.figure = Figure(dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.grid(color='gray', linestyle='--', linewidth=0.2)
+        self.decorations = []
+        self.laid_out = False
+        self.background = None
+        self.background_limits = None
+
+        if kind == "orbits":
+            self.ax.set_aspect('equal')
+            self.ax.set_xlabel('x (' + xunit + ')')
+            self.ax.set_ylabel('y (' + yunit + ')')
+            self.ax.set_title('Binary system')
+            styles = ('r-', 'b-')
+        elif kind == "velocities":
+            self.ax.set_xlabel('Time (' + xunit + ')')
+            self.ax.set_ylabel(r'$V_{rad}$' + ' (' + yunit + ')')
+            self.ax.set_title('Radial velocities')
+            styles = ('r-', 'b-')
+        else:
+            self.ax.set_xlabel('Time (' + xunit + ')')
+            self.ax.set_ylabel('Brightness (mag)')
+            self.ax.set_title('Light curve')
+            self.ax.invert_yaxis()
+            styles = ('g-',)
+
+        self.lines = [self.ax.plot([], [], style, linewidth=0.5)[0]
+                      for style in styles]
+
+    def update(self, system):
+        if self.kind == "orbits":
+            curves = [(orbit[:, 0], orbit[:, 1])
+                      for orbit in (system["orbit1"], system["orbit2"])]
+        elif self.kind == "velocities":
+            curves = [(system["time"], system["velocity1"]),
+                      (system["time"], system["velocity2"])]
+        else:
+            curves = [(system["time"], system["magnitude"])]
+
+        # Limits of orbits are known before plotting and are needed
+        # to decimate them in pixels.
+        if self.kind == "orbits":
+            self._update_orbits_frame(system["orbit1"], system["orbit2"])
+
+        for line, (x, y) in zip(self.lines, curves):
+            if self.decimate and self.kind == "orbits":
+                x, y = _decimate_path(self.figure, self.ax, x, y)
+            elif self.decimate:
+                x, y = _decimate(self.figure, x, y)
+
+            line.set_data(x, y)
+
+        if self.kind != "orbits":
+            self.ax.relim()
+            self.ax.autoscale_view()
+
+    def _update_orbits_frame(self, orbit1, orbit2):
+        for decoration in self.decorations:
+            decoration.remove()
+
+        init_xran, init_yran = _choose_orbits_ranges(orbit1, orbit2)
+        arrow_length = _calculate_arrow_length(init_xran, init_yran)
+        xran, yran = _choose_xy_ranges(init_xran, init_yran, arrow_length)
+        arrow = dict(head_width=0.05*arrow_length,
+                     head_length=0.1*arrow_length, fc='black',
+                     width=0.001*arrow_length)
+        self.decorations = [
+            self.ax.arrow(0, 0, arrow_length, 0, **arrow),
+            self.ax.arrow(0, 0, 0, arrow_length, **arrow),
+            self.ax.annotate("W", (arrow_length, 0.05*arrow_length)),
+            self.ax.annotate("N", (0.05*arrow_length, arrow_length))]
+        self.ax.set_xlim(xran)
+        self.ax.set_ylim(yran)
+
+    def save(self, filename, fmt):
+        # Margins are computed only for the first system and then reused.
+        if not self.laid_out:
+            self.figure.tight_layout()
+            self.laid_out = True
+
+        if fmt != "png":
+            self.figure.savefig(filename, format=fmt)
+            return
+
+        from PIL import Image
+
+        self._draw()
+        image = Image.fromarray(np.asarray(self.canvas.buffer_rgba()))
+        image.save(filename, format="png", compress_level=1)
+
+    def _draw(self):
+        # The background of axes with the same limits is the same, so
+        # it is drawn only when the limits change. Then the lines are
+        # drawn on it.
+        limits = (tuple(self.ax.get_xlim()), tuple(self.ax.get_ylim()))
+
+        if limits != self.background_limits:
+            for line in self.lines:
+                line.set_visible(False)
+
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+            self.background_limits = limits
+
+            for line in self.lines:
+                line.set_visible(True)
+        else:
+            self.canvas.restore_region(self.background)
+
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    def close(self):
+        self.figure.clear()
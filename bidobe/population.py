@@ -0,0 +1,324 @@
+"""
+Synthesize populations of binary systems and estimate how many of them
+show a detectable doppler beaming.
+
+Systems are drawn in batches of fixed size. For each batch parameters
+of orbits and objects (in the same units as the Orbit2DParameters,
+Orbit2DOrientation and OrbitingObject classes take) are drawn at once
+and the peak-to-peak amplitude of the beaming light curve is computed
+with array operations. Only summary statistics and histograms are kept,
+so memory doesn't depend on the size of a population. Each batch has its
+own random stream, so results don't depend on the number of processes.
+
+"""
+from concurrent.futures import ProcessPoolExecutor
+from math import pi
+import numpy as np
+from bidobe.astunit import UnitsConverter
+from bidobe.orbit import (Orbit2DParameters, Orbit2DOrientation,
+                          solve_kepler_equation_array)
+from bidobe.dobe import OrbitingObject
+
+
+class PopulationModel(UnitsConverter):
+    """
+    PopulationModel draws parameters of binary systems. Override any
+    draw_* method to change a distribution.
+    """
+
+    def __init__(self, mass_range=(0.5, 10.0), imf_slope=2.35,
+                 mass_ratio_range=(0.1, 1.0),
+                 sum_semi_major_axes_range=(5e9, 1e12),
+                 max_eccentricity=0.9, max_distance=1000.0, passband="V"):
+        """
+        Parameters
+        ----------
+        mass_range : tuple of float
+            Masses of the first objects in the Sun mass.
+        imf_slope : float
+            The slope of the power-law initial mass function. Default 2.35.
+        mass_ratio_range : tuple of float
+            The ratio of the second mass to the first one (uniform).
+        sum_semi_major_axes_range : tuple of float
+            Sum of semi-major axes in meters (log-uniform).
+        max_eccentricity : float
+            Eccentricities are uniform from 0 to this value. Default 0.9.
+        max_distance : float
+            Systems are uniform in a sphere of this radius in parsecs.
+        passband : str
+            See OrbitingObject.convert_passband_to_frequency.
+        """
+        self.mass_range = mass_range
+        self.imf_slope = imf_slope
+        self.mass_ratio_range = mass_ratio_range
+        self.sum_semi_major_axes_range = sum_semi_major_axes_range
+        self.max_eccentricity = max_eccentricity
+        self.max_distance = max_distance
+        self.passband = passband
+
+    def draw(self, random, size):
+        """
+        Draw parameters of systems.
+
+        Parameters
+        ----------
+        random : numpy.random.Generator
+        size : int
+
+        Returns
+        -------
+        systems : dict of 1D numpy.array
+            Keys as in the binary.conf file.
+        """
+        mass1 = self.draw_masses(random, size)
+        mass2 = mass1*random.uniform(*self.mass_ratio_range, size=size)
+        low, high = np.log10(self.sum_semi_major_axes_range)
+
+        return {
+            "mass1": mass1, "mass2": mass2,
+            "temperature1": self.temperature(mass1),
+            "temperature2": self.temperature(mass2),
+            "radius1": self.radius(mass1), "radius2": self.radius(mass2),
+            "distance": self.max_distance*np.cbrt(random.uniform(size=size)),
+            "sum_major_axis": 10**random.uniform(low, high, size),
+            "eccentricity": random.uniform(0.0, self.max_eccentricity, size),
+            "longitude_node": random.uniform(0.0, 360.0, size),
+            "inclination": np.degrees(np.arccos(
+                random.uniform(-1.0, 1.0, size))),
+            "periastron_argument": random.uniform(0.0, 360.0, size)}
+
+    def draw_masses(self, random, size):
+        """Draw masses from the power-law initial mass function."""
+        low, high = self.mass_range
+        power = 1.0 - self.imf_slope
+        uniform = random.uniform(size=size)
+
+        return (low**power + uniform*(high**power - low**power))**(1/power)
+
+    def temperature(self, mass):
+        """Temperature in Kelvin of a main-sequence star."""
+        return 5778.0*np.power(mass, 0.54)
+
+    def radius(self, mass):
+        """Radius in the Sun radius of a main-sequence star."""
+        return np.power(mass, 0.8)
+
+
+def beaming_amplitudes(systems, passband="V", phases=64):
+    """
+    Calculate peak-to-peak amplitudes of the beaming light curves.
+
+    Parameters
+    ----------
+    systems : dict of 1D numpy.array
+        Parameters of systems, see PopulationModel.draw.
+    passband : str
+        See OrbitingObject.convert_passband_to_frequency.
+    phases : int
+        The number of moments in one period. Default 64.
+
+    Returns
+    -------
+    amplitude : 1D numpy.array
+        Amplitudes in magnitudes.
+    period : 1D numpy.array
+        Orbital periods in seconds.
+    """
+    c = UnitsConverter
+    s = systems
+    mass = s["mass1"] + s["mass2"]
+    period = 2*pi*np.sqrt(s["sum_major_axis"]**3
+                          / (c.G*mass*c.SUN_MASS))
+    eccentricity = s["eccentricity"][:, np.newaxis]
+    mean_anomaly = 2*pi*np.arange(phases)/phases
+    eccentric_anomaly = solve_kepler_equation_array(mean_anomaly,
+                                                    eccentricity)
+    true_anomaly = 2*np.arctan2(
+        np.sqrt(1 + eccentricity)*np.sin(0.5*eccentric_anomaly),
+        np.sqrt(1 - eccentricity)*np.cos(0.5*eccentric_anomaly))
+    omega = np.radians(s["periastron_argument"])[:, np.newaxis]
+
+    # See Orbit3D.calculate_radial_velocity. The second object moves
+    # with the periastron argument increased by 180 degrees.
+    semi_major_axis = s["sum_major_axis"]*s["mass2"]/mass
+    K1 = (2*pi*semi_major_axis*np.sin(np.radians(s["inclination"]))
+          / (period*np.sqrt(1 - s["eccentricity"]**2)))
+    shape = np.cos(omega + true_anomaly) + eccentricity*np.cos(omega)
+    velocity1 = K1[:, np.newaxis]*shape
+    velocity2 = -(s["mass1"]/s["mass2"])[:, np.newaxis]*velocity1
+
+    frequency = (c.LIGHT_SPEED
+                 / OrbitingObject.PASSBANDS_CENTRAL_WAVELENGTH[passband])
+    flux1, alpha1 = _flux_and_alpha(s["radius1"], s["temperature1"],
+                                    s["distance"], frequency)
+    flux2, alpha2 = _flux_and_alpha(s["radius2"], s["temperature2"],
+                                    s["distance"], frequency)
+    doppler_flux = (
+        flux1[:, np.newaxis]*(1.0 + (3.0 - alpha1[:, np.newaxis])
+                              * velocity1/c.LIGHT_SPEED)
+        + flux2[:, np.newaxis]*(1.0 + (3.0 - alpha2[:, np.newaxis])
+                                * velocity2/c.LIGHT_SPEED))
+    total = (flux1 + flux2)[:, np.newaxis]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = 2.5*np.log10(np.abs(doppler_flux)/total)
+
+    amplitude = np.nan_to_num(np.ptp(magnitude, axis=1))
+
+    return amplitude, period
+
+
+def _flux_and_alpha(radius, temperature, distance, frequency):
+    # See OrbitingObject.calculate_stationary_flux and
+    # calculate_alpha_parameter.
+    c = UnitsConverter
+    flux = (c.STEFAN_BOLTZMANN_CONSTANT*temperature**4
+            * (radius*c.SUN_RADIUS/(distance*c.PARSEC))**2)
+    flux = np.where(temperature > 5000, flux, 0.0)
+    x = c.PLANCK_CONSTANT*frequency/(c.BOLTZMANN_CONSTANT*temperature)
+    alpha = 3 - x/(-np.expm1(-x))
+
+    return flux, alpha
+
+
+def system_objects(systems, index, passband="V"):
+    """
+    Return Orbit2DParameters, Orbit2DOrientation and two OrbitingObject
+    objects of a single system of a batch, e.g. to compute its full
+    ephemeris.
+    """
+    s = dict((key, float(values[index])) for key, values in systems.items())
+    parameters = Orbit2DParameters(s["mass1"], s["mass2"],
+                                   s["sum_major_axis"], s["eccentricity"])
+    orientation = Orbit2DOrientation(s["longitude_node"], s["inclination"],
+                                     s["periastron_argument"])
+    object1 = OrbitingObject(s["distance"], s["radius1"],
+                             s["temperature1"], passband)
+    object2 = OrbitingObject(s["distance"], s["radius2"],
+                             s["temperature2"], passband)
+
+    return parameters, orientation, object1, object2
+
+
+class PopulationSummary:
+    """
+    PopulationSummary accumulates statistics of beaming amplitudes and
+    periods of systems in a population.
+    """
+
+    AMPLITUDE_BINS = np.linspace(-8.0, 0.0, 81)
+    PERIOD_BINS = np.linspace(-2.0, 5.0, 71)
+
+    def __init__(self, threshold=1e-4):
+        """
+        Parameters
+        ----------
+        threshold : float
+            The smallest detectable amplitude in magnitudes.
+            Default 1e-4.
+        """
+        self.threshold = threshold
+        self.count = 0
+        self.detected = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.maximum = 0.0
+        self.amplitude_histogram = np.zeros(len(self.AMPLITUDE_BINS) - 1,
+                                            dtype=np.int64)
+        self.period_histogram = np.zeros(len(self.PERIOD_BINS) - 1,
+                                         dtype=np.int64)
+
+    def update(self, amplitude, period):
+        """
+        Add a batch of amplitudes in magnitudes and periods in seconds.
+        """
+        other = PopulationSummary(self.threshold)
+        other.count = len(amplitude)
+
+        if other.count == 0:
+            return self
+
+        other.detected = int(np.sum(amplitude >= self.threshold))
+        other.mean = float(np.mean(amplitude))
+        other.m2 = float(np.sum((amplitude - other.mean)**2))
+        other.maximum = float(np.max(amplitude))
+
+        with np.errstate(divide="ignore"):
+            other.amplitude_histogram += np.histogram(
+                np.log10(amplitude), self.AMPLITUDE_BINS)[0]
+
+        other.period_histogram += np.histogram(
+            np.log10(period/UnitsConverter.DAY), self.PERIOD_BINS)[0]
+
+        return self.merge(other)
+
+    def merge(self, other):
+        """Add statistics of another summary (Chan et al. formula)."""
+        count = self.count + other.count
+
+        if count == 0:
+            return self
+
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta**2*self.count*other.count/count
+        self.mean += delta*other.count/count
+        self.count = count
+        self.detected += other.detected
+        self.maximum = max(self.maximum, other.maximum)
+        self.amplitude_histogram += other.amplitude_histogram
+        self.period_histogram += other.period_histogram
+
+        return self
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2/self.count) if self.count else 0.0
+
+    @property
+    def detected_fraction(self):
+        return self.detected/self.count if self.count else 0.0
+
+
+def synthesize(model, systems, batch_size=100000, seed=0, workers=1,
+               threshold=1e-4):
+    """
+    Draw a population and return its PopulationSummary.
+
+    Parameters
+    ----------
+    model : PopulationModel
+    systems : int
+        The number of systems.
+    batch_size : int
+        The number of systems computed at once. Default 100000.
+    seed : int
+        The seed of random streams. Default 0.
+    workers : int
+        The number of processes. Default 1.
+    threshold : float
+        The smallest detectable amplitude in magnitudes. Default 1e-4.
+    """
+    tasks = [(model, min(batch_size, systems - start), seed, index,
+              threshold)
+             for index, start in enumerate(range(0, systems, batch_size))]
+    summary = PopulationSummary(threshold)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for batch in executor.map(_synthesize_batch, tasks):
+                summary.merge(batch)
+    else:
+        for task in tasks:
+            summary.merge(_synthesize_batch(task))
+
+    return summary
+
+
+def _synthesize_batch(task):
+    model, size, seed, index, threshold = task
+    random = np.random.default_rng(
+        np.random.SeedSequence(seed, spawn_key=(index,)))
+    systems = model.draw(random, size)
+    amplitude, period = beaming_amplitudes(systems, model.passband)
+
+    return PopulationSummary(threshold).update(amplitude, period)
@@ -0,0 +1,307 @@
+"""
+Profile time and memory of stages of the computation.
+
+Profiling is off by default. The library marks its stages (computing
+chunks of an ephemeris, saving it, drawing each figure) with the
+profile_stage context manager which does nothing unless a Profiler is
+active:
+
+    with Profiler() as profiler:
+        ephemeris = execute(plan)
+        write_outputs(plan, ephemeris)
+
+    profiler.write_chrome_trace("trace.json")
+    profiler.write_collapsed("trace.folded")
+
+An active profiler records the duration of each stage and the memory
+traced by the tracemalloc module: allocated at the end, the peak and
+the top allocation sites. The peak of a stage needs the
+tracemalloc.reset_peak function of Python 3.9; on older versions only
+the global peak of a process is known, so stages have no peak. A thread
+samples the call stack of the profiled thread at a fixed interval.
+Stages and memory are written in the Chrome trace format
+(chrome://tracing, Perfetto, speedscope), samples in the collapsed stack
+format of flame graphs (flamegraph.pl, speedscope).
+
+Only the process which starts the profiler is sampled; computations in
+worker processes appear as time spent waiting in their stages.
+
+"""
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from time import perf_counter
+
+
+_ACTIVE = None
+
+# The tracemalloc.reset_peak function is available since Python 3.9.
+_STAGE_PEAKS = hasattr(tracemalloc, "reset_peak")
+
+
+def active_profiler():
+    """Return the active Profiler object or None."""
+    return _ACTIVE
+
+
+@contextmanager
+def profile_stage(name, **details):
+    """
+    Mark a stage of the computation. It records the stage only if
+    a profiler is active.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    details : dict
+        Additional values saved with the stage, e.g. a number of samples.
+    """
+    if _ACTIVE is None:
+        yield
+    else:
+        with _ACTIVE.stage(name, **details):
+            yield
+
+
+class Profiler:
+    """
+    Profiler records stages, memory allocations and sampled call stacks.
+    """
+
+    def __init__(self, interval=0.005, memory=True, allocations=10,
+                 frames=1):
+        """
+        Parameters
+        ----------
+        interval : float
+            The time between samples of the call stack in seconds.
+            Zero disables sampling. Default 0.005.
+        memory : bool
+            Trace allocations with the tracemalloc module. Default True.
+        allocations : int
+            The number of top allocation sites saved for each stage.
+            Zero saves only totals, which is much faster. Default 10.
+        frames : int
+            The number of frames stored by tracemalloc for each
+            allocation. Default 1.
+        """
+        self.interval = interval
+        self.memory = memory
+        self.allocations = allocations
+        self.frames = frames
+        self.stages = []
+        self.samples = {}
+        self._stack = []
+        self._start = None
+        self._thread = None
+        self._thread_id = None
+        self._stop_sampling = threading.Event()
+        self._started_tracing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Start profiling the current thread and make the profiler active."""
+        global _ACTIVE
+
+        if _ACTIVE is not None:
+            raise RuntimeError("Another profiler is already active")
+
+        _ACTIVE = self
+        self._start = perf_counter()
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+
+        if self.interval > 0:
+            self._thread_id = threading.get_ident()
+            self._stop_sampling.clear()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+
+        return self
+
+    def stop(self):
+        """Stop profiling. Open stages are closed."""
+        global _ACTIVE
+
+        while self._stack:
+            self._close_stage()
+
+        if self._thread is not None:
+            self._stop_sampling.set()
+            self._thread.join()
+            self._thread = None
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        if _ACTIVE is self:
+            _ACTIVE = None
+
+    @contextmanager
+    def stage(self, name, **details):
+        """Record a stage, see the profile_stage function."""
+        self._open_stage(name, details)
+
+        try:
+            yield
+        finally:
+            self._close_stage()
+
+    def _open_stage(self, name, details):
+        stage = {"name": name, "details": details, "depth": len(self._stack),
+                 "start": perf_counter() - self._start}
+
+        if self._tracing():
+            current, peak = tracemalloc.get_traced_memory()
+
+            # The peak of a stage starts at its beginning. The peak reached
+            # so far belongs to the enclosing stage.
+            if _STAGE_PEAKS and self._stack:
+                parent = self._stack[-1]
+                parent["peak"] = max(parent.get("peak", 0), peak)
+
+            if self.allocations:
+                stage["snapshot"] = tracemalloc.take_snapshot()
+                current = tracemalloc.get_traced_memory()[0]
+
+            if _STAGE_PEAKS:
+                tracemalloc.reset_peak()
+
+            stage["memory_start"] = current
+
+        self._stack.append(stage)
+
+    def _close_stage(self):
+        stage = self._stack.pop()
+        stage["duration"] = perf_counter() - self._start - stage["start"]
+
+        if self._tracing() and "memory_start" in stage:
+            current, peak = tracemalloc.get_traced_memory()
+            stage["memory_end"] = current
+
+            if _STAGE_PEAKS:
+                stage["peak"] = max(stage.get("peak", 0), peak)
+
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent["peak"] = max(parent.get("peak", 0),
+                                         stage["peak"])
+
+            snapshot = stage.pop("snapshot", None)
+
+            if snapshot is not None:
+                stage["top_allocations"] = _top_allocations(
+                    snapshot, tracemalloc.take_snapshot(), self.allocations)
+
+        self.stages.append(stage)
+
+    def _tracing(self):
+        return self.memory and tracemalloc.is_tracing()
+
+    def _sample(self):
+        while not self._stop_sampling.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+
+            if frame is None:
+                continue
+
+            names = []
+
+            while frame is not None:
+                code = frame.f_code
+                names.append("{0} ({1}:{2})".format(
+                    code.co_name, os.path.basename(code.co_filename),
+                    code.co_firstlineno))
+                frame = frame.f_back
+
+            stages = ["[{0}]".format(stage["name"])
+                      for stage in list(self._stack)]
+            stack = ";".join(stages + names[::-1])
+            self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def summary(self):
+        """
+        Return recorded stages in the order of their beginning.
+
+        Returns
+        -------
+        stages : list of dict
+            name, depth, start and duration in seconds and, if memory
+            is traced, memory_start, memory_end and, since Python 3.9,
+            peak in bytes.
+        """
+        return [dict((key, value) for key, value in stage.items()
+                     if key != "snapshot")
+                for stage in sorted(self.stages,
+                                    key=lambda stage: stage["start"])]
+
+    def chrome_trace(self):
+        """Return stages and memory as a dictionary of the Chrome trace."""
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                   "args": {"name": "bidobe"}}]
+
+        for stage in self.summary():
+            args = dict(stage["details"])
+
+            for key in ("memory_start", "memory_end", "peak",
+                        "top_allocations"):
+                if key in stage:
+                    args[key] = stage[key]
+
+            start = 1e6*stage["start"]
+            events.append({"name": stage["name"], "cat": "stage", "ph": "X",
+                           "ts": start, "dur": 1e6*stage["duration"],
+                           "pid": pid, "tid": 0, "args": args})
+
+            if "memory_start" in stage:
+                events.append({"name": "traced memory", "ph": "C",
+                               "ts": start, "pid": pid, "tid": 0,
+                               "args": {"bytes": stage["memory_start"]}})
+                events.append({"name": "traced memory", "ph": "C",
+                               "ts": start + 1e6*stage["duration"],
+                               "pid": pid, "tid": 0,
+                               "args": {"bytes": stage["memory_end"]}})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"sampling_interval": self.interval}}
+
+    def write_chrome_trace(self, filename):
+        """Save stages and memory in the Chrome trace JSON format."""
+        with open(filename, "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+    def write_collapsed(self, filename):
+        """Save sampled call stacks in the collapsed format."""
+        with open(filename, "w") as folded_file:
+            for stack, count in sorted(self.samples.items()):
+                folded_file.write("{0} {1}\n".format(stack, count))
+
+
+def _top_allocations(before, after, number):
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__),
+               tracemalloc.Filter(False, __file__)]
+    statistics = after.filter_traces(ignored).compare_to(
+        before.filter_traces(ignored), "lineno")
+    top = []
+
+    for statistic in statistics[:number]:
+        frame = statistic.traceback[0]
+        top.append({"location": "{0}:{1}".format(frame.filename,
+                                                  frame.lineno),
+                    "size_diff": statistic.size_diff,
+                    "count_diff": statistic.count_diff})
+
+    return top
@@ -0,0 +1,573 @@
+"""
+Serve model curves of binary systems from a local asyncio service.
+
+The service accepts parameters of a binary system (the same ones which
+are stored in the binary.conf file) as a JSON payload, computes orbits,
+radial velocities and a light curve in a pool of worker processes and
+returns them as JSON. Identical requests which are computed at the same
+moment are merged into a single computation and repeated requests are
+served from an LRU cache. Requests are limited to MAX_SAMPLES samples
+and the cache to CACHE_BYTES of responses by default. A worker pool
+which breaks, e.g. when a worker is killed, is replaced by a new one.
+
+Run the service from the command line:
+  $ python3 -m bidobe.service --port 8080
+  $ python3 -m bidobe.service --unix /tmp/bidobe.sock
+  $ python3 -m bidobe.service --benchmark 500
+
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bidobe.config import TimeGrid, build_system, validate_parameters
+from bidobe.ephemeris import Ephemeris
+
+
+PARAMETERS = ("mass1", "mass2", "temperature1", "temperature2", "radius1",
+              "radius2", "distance", "sum_major_axis", "eccentricity",
+              "longitude_node", "inclination", "periastron_argument",
+              "multiply_period_length", "time_length_pieces", "passband")
+
+# The default limits of the number of samples of a request and of
+# the size of cached responses in bytes.
+MAX_SAMPLES = 1000000
+CACHE_BYTES = 256*2**20
+
+
+class LRUCache:
+    """
+    LRUCache stores a bounded number of values and optionally a bounded
+    total size of them, measured with len. When the cache is full
+    the least recently used values are removed. The bytes attribute is
+    the total size of values if maxbytes is set.
+    """
+
+    def __init__(self, maxsize=128, maxbytes=None):
+        """
+        Parameters
+        ----------
+        maxsize : int
+            The maximum number of stored values. Default 128.
+        maxbytes : int
+            The maximum total length of stored values, e.g. bytes.
+            A larger value isn't stored. Default no limit.
+        """
+        if maxsize < 1:
+            raise ValueError("The size of a cache must be positive")
+
+        if maxbytes is not None and maxbytes < 1:
+            raise ValueError("The number of bytes of a cache must be "
+                             "positive")
+
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get(self, key):
+        """Return a value for the key or None if there is no such key."""
+        try:
+            value = self._values.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._values[key] = value
+        self.hits += 1
+
+        return value
+
+    def put(self, key, value):
+        """Store a value and remove the least recently used ones if needed."""
+        if key in self._values:
+            self.bytes -= self._size(self._values.pop(key))
+
+        if self.maxbytes is not None and len(value) > self.maxbytes:
+            return
+
+        self._values[key] = value
+        self.bytes += self._size(value)
+
+        while len(self._values) > self.maxsize or (
+                self.maxbytes is not None and self.bytes > self.maxbytes):
+            self.bytes -= self._size(self._values.popitem(last=False)[1])
+
+    def _size(self, value):
+        return 0 if self.maxbytes is None else len(value)
+
+
+def normalize_parameters(parameters, max_samples=None):
+    """
+    Check and convert parameters of a binary system to the types which
+    are used in the binary.conf file.
+
+    Parameters
+    ----------
+    parameters : dict
+        Parameters of a binary system. All keys from PARAMETERS are
+        required.
+    max_samples : int
+        The maximum value of time_length_pieces. Default no limit.
+
+    Raises
+    ------
+    ValueError
+        If any value is missing, can't be converted or is out of range
+        (see bidobe.config.validate_parameters).
+    """
+    if not isinstance(parameters, dict):
+        raise ValueError("Parameters must be a JSON object")
+
+    missing = [name for name in PARAMETERS if name not in parameters]
+
+    if missing:
+        raise ValueError("Missing parameters: {0}".format(", ".join(missing)))
+
+    normalized = {}
+    errors = []
+
+    for name in PARAMETERS:
+        if name == "passband":
+            kind = str
+        elif name in ("temperature1", "temperature2", "time_length_pieces"):
+            kind = int
+        else:
+            kind = float
+
+        try:
+            normalized[name] = kind(parameters[name])
+        except (TypeError, ValueError):
+            errors.append("{0} = {1!r} is not {2}".format(
+                name, parameters[name], kind.__name__))
+
+    if not errors:
+        errors = validate_parameters(normalized)
+
+    if (not errors and max_samples is not None
+            and normalized["time_length_pieces"] > max_samples):
+        errors.append("time_length_pieces must be at most {0}".format(
+            max_samples))
+
+    if errors:
+        raise ValueError("; ".join(errors))
+
+    return normalized
+
+
+def compute_curves(parameters):
+    """
+    Compute projected orbits, radial velocities and a light curve of
+    a binary system. All values are expressed in the SI units.
+
+    Parameters
+    ----------
+    parameters : dict
+        Parameters of a binary system, see normalize_parameters.
+
+    Returns
+    -------
+    curves : dict
+        Lists with keys: time, position1, position2, velocity1, velocity2,
+        magnitude.
+    """
+    p = normalize_parameters(parameters)
+    system = build_system(p)
+    moments = TimeGrid(p["multiply_period_length"],
+                       p["time_length_pieces"]).times(system[0].period)
+    ephemeris = Ephemeris.from_orbits(*(system + (moments,)))
+
+    return {"time": ephemeris.time.tolist(),
+            "position1": ephemeris.position1.tolist(),
+            "position2": ephemeris.position2.tolist(),
+            "velocity1": ephemeris.velocity1.tolist(),
+            "velocity2": ephemeris.velocity2.tolist(),
+            "magnitude": ephemeris.magnitude.tolist()}
+
+
+def _encode_curves(parameters):
+    return json.dumps(compute_curves(parameters)).encode()
+
+
+def _parameters_key(parameters, max_samples=None):
+    normalized = json.dumps(normalize_parameters(parameters, max_samples),
+                            sort_keys=True)
+
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+class LightCurveService:
+    """
+    LightCurveService computes curves of binary systems in a pool of
+    worker processes and serves them through HTTP over TCP or a Unix socket.
+
+    Endpoints:
+      POST /curves  JSON parameters -> JSON curves
+      GET  /stats   statistics of the cache
+    """
+
+    def __init__(self, cache_size=128, workers=None, executor=None,
+                 max_samples=MAX_SAMPLES, cache_bytes=CACHE_BYTES):
+        """
+        Parameters
+        ----------
+        cache_size : int
+            The maximum number of cached results. Default 128.
+        workers : int
+            The number of worker processes. Default number of CPUs.
+        executor : concurrent.futures.Executor
+            An executor used instead of the default process pool.
+        max_samples : int
+            The maximum number of samples of a request. Default
+            MAX_SAMPLES.
+        cache_bytes : int
+            The maximum size of cached results in bytes. Default
+            CACHE_BYTES.
+        """
+        self.cache = LRUCache(cache_size, cache_bytes)
+        self.workers = workers
+        self.executor = executor or ProcessPoolExecutor(max_workers=workers)
+        self.max_samples = max_samples
+        self.computations = 0
+        self.restarts = 0
+        self._pending = {}
+        self._server = None
+
+    async def compute(self, parameters):
+        """
+        Return curves encoded as JSON bytes for the parameters.
+
+        Raises
+        ------
+        ValueError
+            If the parameters are invalid or have too many samples.
+        BrokenProcessPool
+            If a worker died. The pool is replaced for next requests.
+        """
+        key = _parameters_key(parameters, self.max_samples)
+        encoded = self.cache.get(key)
+
+        if encoded is not None:
+            return encoded
+
+        future = self._pending.get(key)
+        executor = self.executor
+
+        try:
+            if future is None:
+                loop = asyncio.get_event_loop()
+                future = loop.run_in_executor(executor, _encode_curves,
+                                              parameters)
+                future.add_done_callback(
+                    lambda f: self._store_result(key, f))
+                self._pending[key] = future
+                self.computations += 1
+
+            return await asyncio.shield(future)
+        except BrokenProcessPool:
+            self._restart_executor(executor)
+            raise
+
+    def _restart_executor(self, broken):
+        # Requests which failed with the same pool restart it only once.
+        if self.executor is not broken:
+            return
+
+        broken.shutdown(wait=False)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.restarts += 1
+
+    def _store_result(self, key, future):
+        self._pending.pop(key, None)
+
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    def statistics(self):
+        """Return a dictionary with statistics of the cache."""
+        return {"size": len(self.cache), "maxsize": self.cache.maxsize,
+                "bytes": self.cache.bytes, "maxbytes": self.cache.maxbytes,
+                "hits": self.cache.hits, "misses": self.cache.misses,
+                "computations": self.computations,
+                "pending": len(self._pending), "restarts": self.restarts}
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                method, path, body = await _read_request(reader)
+
+                if method == "POST" and path == "/curves":
+                    status, response = 200, await self.compute(json.loads(
+                        body.decode()))
+                elif method == "GET" and path == "/stats":
+                    status, response = 200, json.dumps(
+                        self.statistics()).encode()
+                else:
+                    status, response = 404, b'{"error": "not found"}'
+            except (ValueError, KeyError) as error:
+                status = 400
+                response = json.dumps({"error": str(error)}).encode()
+            except Exception as error:
+                status = 500
+                response = json.dumps({"error": "{0}: {1}".format(
+                    type(error).__name__, error)}).encode()
+
+            _write_response(writer, status, response)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8080, path=None):
+        """
+        Start listening on a TCP port or on a Unix socket if the path
+        is given. Return the asyncio server.
+        """
+        if path:
+            self._server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self._server = await asyncio.start_server(self.handle, host, port)
+
+        return self._server
+
+    async def close(self):
+        """Stop the server and the worker pool."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        self.executor.shutdown()
+
+
+async def _read_message(reader):
+    # The body is read up to Content-Length instead of EOF because worker
+    # processes forked by the pool may hold copies of the connection.
+    start_line = await reader.readline()
+    content_length = 0
+
+    while True:
+        line = await reader.readline()
+
+        if line in (b"\r\n", b"\n", b""):
+            break
+
+        name, _, value = line.decode().partition(":")
+
+        if name.strip().lower() == "content-length":
+            content_length = int(value)
+
+    body = await reader.readexactly(content_length)
+
+    return start_line.decode(), body
+
+
+async def _read_request(reader):
+    request_line, body = await _read_message(reader)
+
+    try:
+        method, path, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise ValueError("Malformed request line")
+
+    return method, path, body
+
+
+def _write_response(writer, status, body):
+    reasons = {200: "OK", 400: "Bad Request", 404: "Not Found",
+               500: "Internal Server Error"}
+    header = ("HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\n"
+              "Content-Length: {2}\r\nConnection: close\r\n\r\n").format(
+                  status, reasons[status], len(body))
+    writer.write(header.encode() + body)
+
+
+async def request_curves(parameters, host="127.0.0.1", port=8080, path=None):
+    """
+    Send parameters to a running service and return decoded curves.
+
+    Parameters
+    ----------
+    parameters : dict
+        Parameters of a binary system, see normalize_parameters.
+    host, port : str, int
+        Address of the service listening on TCP.
+    path : str
+        Path to the Unix socket of the service. If given host and port
+        are ignored.
+
+    Raises
+    ------
+    ValueError
+        If the service rejects the parameters.
+    RuntimeError
+        If the computation fails in the service.
+    ConnectionError
+        If the response is empty or malformed.
+    """
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    try:
+        body = json.dumps(parameters).encode()
+        header = ("POST /curves HTTP/1.1\r\nHost: {0}\r\n"
+                  "Content-Type: application/json\r\n"
+                  "Content-Length: {1}\r\n\r\n").format(host, len(body))
+        writer.write(header.encode() + body)
+
+        try:
+            status_line, content = await _read_message(reader)
+            status = int(status_line.split(" ", 2)[1])
+            content = json.loads(content.decode())
+        except (IndexError, ValueError, asyncio.IncompleteReadError):
+            raise ConnectionError("The service sent no valid response")
+    finally:
+        writer.close()
+
+    if status == 400:
+        raise ValueError(content["error"])
+    elif status != 200:
+        raise RuntimeError("The service failed ({0}): {1}".format(
+            status, content.get("error")))
+
+    return content
+
+
+async def benchmark(parameters_list, requests=200, concurrency=8,
+                    host="127.0.0.1", port=8080, path=None):
+    """
+    Measure latency and throughput of a running service.
+
+    Parameters
+    ----------
+    parameters_list : list of dict
+        Parameters which are sent cyclically to the service.
+    requests : int
+        The total number of requests. Default 200.
+    concurrency : int
+        The number of requests sent at the same time. Default 8.
+    host, port, path
+        Address of the service, see request_curves.
+
+    Returns
+    -------
+    statistics : dict
+        Throughput in requests per second and latencies in seconds.
+    """
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _timed_request(parameters):
+        async with semaphore:
+            start = time.perf_counter()
+            await request_curves(parameters, host, port, path)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _timed_request(parameters_list[i % len(parameters_list)])
+        for i in range(requests)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    return {"requests": requests, "seconds": elapsed,
+            "throughput": requests/elapsed,
+            "latency_mean": sum(latencies)/len(latencies),
+            "latency_p50": latencies[len(latencies)//2],
+            "latency_p95": latencies[int(0.95*(len(latencies) - 1))],
+            "latency_max": latencies[-1]}
+
+
+async def _run_benchmark(parameters_list, requests, concurrency,
+                         cache_size, workers):
+    service = LightCurveService(cache_size, workers)
+    server = await service.start(port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    try:
+        cold = await benchmark(parameters_list, len(parameters_list),
+                               concurrency, port=port)
+        warm = await benchmark(parameters_list, requests, concurrency,
+                               port=port)
+    finally:
+        await service.close()
+
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve model curves of binary systems.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix", help="path to a Unix socket")
+    parser.add_argument("--cache-size", type=int, default=128)
+    parser.add_argument("--cache-bytes", type=int, default=CACHE_BYTES)
+    parser.add_argument("--max-samples", type=int, default=MAX_SAMPLES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--config", default="binary.conf",
+                        help="configuration file used by the benchmark")
+    parser.add_argument("--benchmark", type=int, metavar="REQUESTS",
+                        help="run a local benchmark instead of serving")
+    args = parser.parse_args()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    if args.benchmark:
+        import configparser
+
+        config = configparser.ConfigParser()
+
+        if config.read(args.config) == []:
+            parser.error("There is no {0} file".format(args.config))
+
+        parameters = {}
+
+        for section in ("OBJECTS", "ORBITS", "OBSERVATION"):
+            parameters.update(config[section])
+
+        parameters_list = []
+
+        for i in range(8):
+            system = dict(parameters)
+            system["inclination"] = float(parameters["inclination"]) + i
+            parameters_list.append(system)
+
+        cold, warm = loop.run_until_complete(_run_benchmark(
+            parameters_list, args.benchmark, 8, args.cache_size,
+            args.workers))
+
+        for label, result in (("cold", cold), ("warm", warm)):
+            print("{0}: {1:.1f} req/s, mean {2:.2f} ms, p95 {3:.2f} ms".format(
+                label, result["throughput"], 1e3*result["latency_mean"],
+                1e3*result["latency_p95"]))
+        return
+
+    service = LightCurveService(args.cache_size, args.workers,
+                                max_samples=args.max_samples,
+                                cache_bytes=args.cache_bytes)
+    loop.run_until_complete(service.start(args.host, args.port, args.unix))
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(service.close())
+
+
+if __name__ == "__main__":
+    main()
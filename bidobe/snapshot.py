@@ -0,0 +1,379 @@
+"""
+Save precomputed binary systems to a single binary file and map it back
+into memory.
+
+A snapshot stores for each system its parameters (the keys of
+the binary.conf file), derived constants (period, semi-major axes,
+semi-amplitudes of radial velocities, alpha parameters and fluxes) and
+an ephemeris with the same number of samples (see the Ephemeris class).
+All values are in the SI units.
+
+Layout of a file:
+
+    magic        8 bytes   b"BIDOBESS"
+    version      2 x uint16 (major, minor), little-endian
+    header size  uint32
+    header       JSON: dtypes, shapes and offsets of sections, index keys
+                 and user metadata
+    constants    structured array, one row per system
+    curves       array(shape=(systems, samples), dtype=Ephemeris.DTYPE)
+    index        int64 numbers of systems sorted by the index keys
+
+Sections start at multiples of 64 bytes. Readers map sections with
+numpy.memmap, so opening a file doesn't read it and each system is read
+only when accessed:
+
+    with SnapshotWriter("grid.bds", len(grid), samples=500) as writer:
+        for parameters in grid:
+            writer.append(parameters)
+
+    snapshot = Snapshot("grid.bds")
+    number = snapshot.find(eccentricity=0.3, inclination=60.0)[0]
+    ephemeris = snapshot.ephemeris(number)
+
+"""
+import json
+import struct
+import numpy as np
+from bidobe.config import SystemParameters, TimeGrid, build_system
+from bidobe.ephemeris import Ephemeris
+
+
+MAGIC = b"BIDOBESS"
+VERSION = (1, 0)
+ALIGNMENT = 64
+
+CONSTANTS_DTYPE = np.dtype(
+    [(field, "S1" if field == "passband" else float)
+     for field in SystemParameters._fields]
+    + [("period", float), ("semi_major_axis1", float),
+       ("semi_major_axis2", float), ("amplitude1", float),
+       ("amplitude2", float), ("alpha1", float), ("alpha2", float),
+       ("flux1", float), ("flux2", float)])
+
+INDEX_KEYS = ("mass1", "mass2", "sum_major_axis", "eccentricity",
+              "inclination", "periastron_argument")
+
+_PREFIX = struct.Struct("<8sHHI")
+
+
+def system_constants(parameters):
+    """
+    Return a row of the constants section for parameters of a binary
+    system given as a SystemParameters object or a dictionary.
+    """
+    p = parameters if isinstance(parameters, dict) else parameters._asdict()
+    orbit1, orbit2, object1, object2 = build_system(p)
+    row = np.zeros((), dtype=CONSTANTS_DTYPE)
+
+    for field in SystemParameters._fields:
+        row[field] = p[field]
+
+    row["period"] = orbit1.period
+    row["semi_major_axis1"] = orbit1.semi_major_axis
+    row["semi_major_axis2"] = orbit2.semi_major_axis
+    row["amplitude1"] = orbit1.calculate_radial_velocity_amplitude()
+    row["amplitude2"] = orbit2.calculate_radial_velocity_amplitude()
+    row["alpha1"] = object1.alpha
+    row["alpha2"] = object2.alpha
+    row["flux1"] = object1.flux
+    row["flux2"] = object2.flux
+
+    return row
+
+
+def _align(offset):
+    return -(-offset//ALIGNMENT)*ALIGNMENT
+
+
+class SnapshotWriter:
+    """
+    SnapshotWriter creates a snapshot file of a known number of systems
+    and fills it. The index is written when the writer is closed.
+    """
+
+    def __init__(self, filename, systems, samples, index=INDEX_KEYS,
+                 metadata=None):
+        """
+        Parameters
+        ----------
+        filename : str
+        systems : int
+            The number of systems.
+        samples : int
+            The number of samples of an ephemeris of each system.
+        index : tuple of str
+            Fields of CONSTANTS_DTYPE by which systems are sorted in
+            the index. Default INDEX_KEYS.
+        metadata : dict
+            Any values which can be saved as JSON, e.g. a description
+            of a grid.
+        """
+        unknown = [key for key in index if key not in CONSTANTS_DTYPE.names]
+
+        if unknown:
+            raise ValueError("Unknown index keys: {0}".format(
+                ", ".join(unknown)))
+
+        self.filename = filename
+        self.systems = systems
+        self.samples = samples
+        self.index = tuple(index)
+        self.metadata = metadata or {}
+        self.written = 0
+        self.header = self._make_header(complete=False)
+        self._write_header(create=True)
+        self.constants = self._map("constants", "r+")
+        self.curves = self._map("curves", "r+")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+
+    def _make_header(self, complete):
+        sections = [("constants", CONSTANTS_DTYPE, (self.systems,)),
+                    ("curves", Ephemeris.DTYPE, (self.systems, self.samples)),
+                    ("index", np.dtype("<i8"), (self.systems,))]
+        header = {"format": "bidobe snapshot", "version": list(VERSION),
+                  "complete": complete, "systems": self.systems,
+                  "samples": self.samples, "index_keys": list(self.index),
+                  "units": {"time": "s", "position": "m",
+                            "velocity": "m/s"},
+                  "metadata": self.metadata, "sections": {}}
+
+        # Offsets depend on the size of the header, so it is enlarged
+        # until offsets fit in. The margin leaves room for the header
+        # rewritten by the close method.
+        size = 0
+
+        while _PREFIX.size + len(json.dumps(header)) + ALIGNMENT > size:
+            size = _align(_PREFIX.size + len(json.dumps(header))
+                          + 2*ALIGNMENT)
+            offset = size
+
+            for name, dtype, shape in sections:
+                header["sections"][name] = {
+                    "offset": offset, "shape": list(shape),
+                    "dtype": np.lib.format.dtype_to_descr(dtype)}
+                offset = _align(offset + dtype.itemsize*int(np.prod(shape)))
+
+            header["header_size"] = size
+            header["file_size"] = offset
+
+        return header
+
+    def _write_header(self, create=False):
+        text = json.dumps(self.header).encode("utf-8")
+        size = self.header["header_size"]
+        prefix = _PREFIX.pack(MAGIC, VERSION[0], VERSION[1], len(text))
+
+        with open(self.filename, "wb" if create else "r+b") as output:
+            output.write(prefix + text.ljust(size - _PREFIX.size, b" "))
+
+            if create:
+                output.truncate(self.header["file_size"])
+
+    def _map(self, name, mode):
+        return _map_section(self.filename, self.header, name, mode)
+
+    def write(self, number, parameters, ephemeris=None,
+              multiply_period_length=1.0):
+        """
+        Save a system.
+
+        Parameters
+        ----------
+        number : int
+            The number of the system in the file.
+        parameters : SystemParameters or dict
+            Parameters in the units of the binary.conf file.
+        ephemeris : Ephemeris
+            An ephemeris in the SI units with the number of samples
+            of the file. Default it is computed for moments covering
+            multiply_period_length periods.
+        multiply_period_length : float
+            See TimeGrid. Default 1.0.
+        """
+        row = system_constants(parameters)
+
+        if ephemeris is None:
+            system = build_system(parameters)
+            time = TimeGrid(multiply_period_length, self.samples).times(
+                system[0].period)
+            ephemeris = Ephemeris.from_orbits(*(system + (time,)))
+        elif len(ephemeris) != self.samples:
+            raise ValueError("The ephemeris must have {0} samples".format(
+                self.samples))
+        elif any(ephemeris.units[quantity] != unit for quantity, unit
+                 in self.header["units"].items()):
+            raise ValueError("The ephemeris must be in the SI units")
+
+        self.constants[number] = row
+        self.curves[number] = ephemeris.data
+        self.written = max(self.written, number + 1)
+
+    def append(self, parameters, ephemeris=None, multiply_period_length=1.0):
+        """Save a system after the last written one, see write."""
+        if self.written == self.systems:
+            raise ValueError("The snapshot is full")
+
+        self.write(self.written, parameters, ephemeris,
+                   multiply_period_length)
+
+    def close(self):
+        """Write the index and mark the file as complete."""
+        if self.constants is None:
+            return
+
+        keys = [self.constants[key] for key in reversed(self.index)]
+        index = self._map("index", "r+")
+        index[:] = np.lexsort(keys) if keys else np.arange(self.systems)
+        index.flush()
+        self.constants.flush()
+        self.curves.flush()
+        del index
+        self.constants = None
+        self.curves = None
+        self.header["complete"] = True
+        self._write_header()
+
+
+def _map_section(filename, header, name, mode):
+    section = header["sections"][name]
+    dtype = np.lib.format.descr_to_dtype(section["dtype"])
+    shape = tuple(section["shape"])
+
+    if 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+
+    return np.memmap(filename, dtype=dtype, mode=mode,
+                     offset=section["offset"], shape=shape)
+
+
+def read_header(filename):
+    """
+    Return the header of a snapshot file as a dictionary.
+
+    Raises
+    ------
+    ValueError
+        If the file isn't a snapshot or its major version is unsupported.
+    """
+    with open(filename, "rb") as snapshot_file:
+        prefix = snapshot_file.read(_PREFIX.size)
+
+        if len(prefix) < _PREFIX.size:
+            raise ValueError("{0} isn't a snapshot".format(filename))
+
+        magic, major, minor, size = _PREFIX.unpack(prefix)
+
+        if magic != MAGIC:
+            raise ValueError("{0} isn't a snapshot".format(filename))
+
+        if major != VERSION[0]:
+            raise ValueError("Unsupported snapshot version {0}.{1}".format(
+                major, minor))
+
+        return json.loads(snapshot_file.read(size).decode("utf-8"))
+
+
+class Snapshot:
+    """
+    Snapshot maps a snapshot file into memory. Constants and curves are
+    numpy.memmap arrays, so only accessed systems are read from the disk.
+    """
+
+    def __init__(self, filename):
+        """
+        Raises
+        ------
+        ValueError
+            If the file isn't a complete snapshot of a supported version.
+        """
+        self.filename = filename
+        self.header = read_header(filename)
+
+        if not self.header["complete"]:
+            raise ValueError("{0} wasn't closed by its writer".format(
+                filename))
+
+        self.index_keys = tuple(self.header["index_keys"])
+        self.metadata = self.header["metadata"]
+        self.constants = _map_section(filename, self.header, "constants",
+                                      "r")
+        # Copy-on-write, so conversions of units don't change the file.
+        self.curves = _map_section(filename, self.header, "curves", "c")
+        self.index = _map_section(filename, self.header, "index", "r")
+
+    def __len__(self):
+        return self.header["systems"]
+
+    @property
+    def samples(self):
+        return self.header["samples"]
+
+    def system(self, number):
+        """Return parameters and derived constants of a system as a dict."""
+        row = self.constants[number]
+
+        return dict((name, row[name].decode() if name == "passband"
+                     else float(row[name])) for name in CONSTANTS_DTYPE.names)
+
+    def parameters(self, number):
+        """Return parameters of a system as a SystemParameters object."""
+        system = self.system(number)
+
+        return SystemParameters(*[system[field]
+                                  for field in SystemParameters._fields])
+
+    def ephemeris(self, number):
+        """Return an ephemeris of a system without copying its data."""
+        return Ephemeris(self.curves[number], dict(self.header["units"]))
+
+    def find(self, **values):
+        """
+        Return numbers of systems with given values of parameters, e.g.
+        find(eccentricity=0.3). Leading keys of the index are found with
+        a binary search, others are compared with the remaining systems.
+        """
+        unknown = [key for key in values if key not in CONSTANTS_DTYPE.names]
+
+        if unknown:
+            raise ValueError("Unknown keys: {0}".format(", ".join(unknown)))
+
+        start, stop = 0, len(self)
+
+        for key in self.index_keys:
+            if key not in values:
+                break
+
+            value = values.pop(key)
+            start, stop = (self._bisect(key, value, start, stop, False),
+                           self._bisect(key, value, start, stop, True))
+
+        numbers = np.asarray(self.index[start:stop])
+
+        for key, value in values.items():
+            if key == "passband":
+                value = value.encode()
+
+            numbers = numbers[self.constants[key][numbers] == value]
+
+        return np.sort(numbers)
+
+    def _bisect(self, key, value, low, high, right):
+        # Only rows of the constants section on the path of the search
+        # are read.
+        while low < high:
+            middle = (low + high)//2
+            current = self.constants[self.index[middle]][key]
+
+            if current < value or (right and current == value):
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
@@ -0,0 +1,292 @@
+"""
+Match observed radial velocity or light curves with a bank of templates.
+
+A shape of a phased radial velocity curve depends only on the eccentricity
+and the argument of periastron. The rest of the parameters change only
+the amplitude and the phase of the curve. A TemplateBank precomputes
+the shapes over a grid of these two parameters and describes each of them
+by a few Fourier harmonics normalized to the amplitude and the phase of
+the first harmonic. A query takes the nearest templates in this space as
+candidates and ranks them by fitting their full curves to observations:
+few harmonics fitted to sparse epochs of an eccentric orbit are too
+inaccurate to choose a template alone.
+
+"""
+import json
+import os
+from math import pi
+import numpy as np
+from scipy.spatial import cKDTree
+from bidobe.orbit import (Orbit2DParameters, Orbit2D,
+                          solve_kepler_equation_array)
+
+
+# The number of moments of the periastron passage per period tried by
+# a query before the best ones are refined.
+SHIFTS = 512
+
+
+class TemplateBank:
+    """
+    TemplateBank stores normalized shapes of phased radial velocity curves
+    for a grid of eccentricities and arguments of periastron and finds
+    the nearest ones for observed curves.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, eccentricity, periastron_argument, phase, features):
+        """
+        Parameters
+        ----------
+        eccentricity, periastron_argument : 1D numpy.array(dtype=float)
+            Parameters of each template. The argument in degrees.
+        phase : 1D numpy.array(dtype=float)
+            The phase of the first harmonic of each template in radians.
+        features : numpy.array(shape=(*,2*harmonics), dtype=float32)
+            Normalized Fourier coefficients of each template.
+        """
+        self.eccentricity = eccentricity
+        self.periastron_argument = periastron_argument
+        self.phase = phase
+        self.features = features
+        self.harmonics = features.shape[1]//2
+        self.index = cKDTree(features)
+
+    def __len__(self):
+        return len(self.eccentricity)
+
+    @classmethod
+    def build(cls, eccentricities, periastron_arguments, harmonics=8,
+              samples=256):
+        """
+        Compute templates for each combination of parameters.
+
+        Parameters
+        ----------
+        eccentricities : sequence of float
+            Eccentricities of the grid between 0 and 1.
+        periastron_arguments : sequence of float
+            Arguments of periastron of the grid in degrees.
+        harmonics : int
+            The number of harmonics describing each template. Default 8.
+        samples : int
+            The number of points in a phase. Default 256.
+        """
+        omega = np.radians(np.asarray(periastron_arguments, dtype=float))
+        mean_anomaly = 2*pi*np.arange(samples)/samples
+        eccentricity = []
+        periastron_argument = []
+        coefficients = []
+
+        for e in eccentricities:
+            orbit = Orbit2D(Orbit2DParameters(1.0, 1.0, 1.0, e))
+            time = orbit.period*mean_anomaly/(2*pi)
+            true_anomaly = orbit.calculate_true_anomalies(time)
+            # The shape of the radial velocity without K, see Orbit3D.
+            curves = (np.cos(omega[:, np.newaxis] + true_anomaly)
+                      + e*np.cos(omega)[:, np.newaxis])
+            spectrum = np.fft.rfft(curves, axis=1)[:, 1:harmonics + 1]
+            coefficients.append(2*spectrum/samples)
+            eccentricity.append(np.full(len(omega), e))
+            periastron_argument.append(np.degrees(omega))
+
+        coefficients = np.concatenate(coefficients)
+        phase, features = _normalize_coefficients(coefficients)
+
+        return cls(np.concatenate(eccentricity),
+                   np.concatenate(periastron_argument), phase, features)
+
+    def query(self, time, values, period, k=5, curve="velocity",
+              candidates=64):
+        """
+        Find templates which fit the best an observed curve.
+
+        Templates nearest to the Fourier harmonics of the observations are
+        candidates. The curve of each candidate is fitted to the observations
+        by its amplitude, offset and the periastron passage, and candidates
+        are sorted by the residuals of the fits.
+
+        Parameters
+        ----------
+        time : 1D numpy.array(dtype=float)
+            Moments of observations, possibly irregular.
+        values : 1D numpy.array(dtype=float)
+            Observed radial velocities or magnitudes.
+        period : float
+            The orbital period in the same unit as time.
+        k : int
+            The number of returned templates. Default 5.
+        curve : str
+            velocity or magnitude. The doppler beaming changes magnitude
+            proportionally to the radial velocity, but the sign depends on
+            the objects. For magnitudes both signs are searched.
+        candidates : int
+            The number of nearest templates fitted for each sign.
+            Default 64.
+
+        Returns
+        -------
+        matches : list of dict
+            Sorted by the residual. Keys: eccentricity, periastron_argument,
+            periastron_passage (in the unit of time), amplitude and offset
+            of the fitted curve, residual (the root mean square of
+            the fit) and distance of the harmonics.
+        """
+        time = np.asarray(time, dtype=float)
+        values = np.asarray(values, dtype=float)
+        coefficients = _fit_harmonics(time, values, period, self.harmonics)
+        signs = (1.0, -1.0) if curve == "magnitude" else (1.0,)
+        distances = {}
+
+        for sign in signs:
+            features = _normalize_coefficients(
+                sign*coefficients[np.newaxis, :])[1]
+            found = self.index.query(features[0],
+                                     k=min(max(k, candidates), len(self)))
+
+            for distance, i in zip(np.atleast_1d(found[0]),
+                                   np.atleast_1d(found[1])):
+                distances[i] = min(distance, distances.get(i, np.inf))
+
+        indices = np.array(sorted(distances))
+        fit = _fit_templates(self.eccentricity[indices],
+                             np.radians(self.periastron_argument[indices]),
+                             2*pi*time/period, values,
+                             positive=curve != "magnitude")
+        matches = []
+
+        for n, i in enumerate(indices):
+            matches.append({
+                "eccentricity": float(self.eccentricity[i]),
+                "periastron_argument": float(self.periastron_argument[i]),
+                "periastron_passage": (fit[0][n]/(2*pi)) % 1.0*period,
+                "amplitude": float(fit[1][n]),
+                "offset": float(fit[2][n]),
+                "residual": float(fit[3][n]),
+                "distance": float(distances[i])})
+
+        matches.sort(key=lambda match: match["residual"])
+
+        return matches[:k]
+
+    def save(self, directory):
+        """Save the bank to a directory as .npy files."""
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        for name in ("eccentricity", "periastron_argument", "phase",
+                     "features"):
+            np.save(os.path.join(directory, name + ".npy"),
+                    getattr(self, name))
+
+        with open(os.path.join(directory, "bank.json"), "w") as meta:
+            json.dump({"version": self.FORMAT_VERSION,
+                       "templates": len(self),
+                       "harmonics": self.harmonics}, meta)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Load a bank saved by the save method. Arrays are memory-mapped
+        unless mmap is False.
+        """
+        with open(os.path.join(directory, "bank.json")) as meta:
+            version = json.load(meta)["version"]
+
+        if version != cls.FORMAT_VERSION:
+            raise ValueError("Unsupported version: {0}".format(version))
+
+        mode = "r" if mmap else None
+        arrays = [np.load(os.path.join(directory, name + ".npy"),
+                          mmap_mode=mode)
+                  for name in ("eccentricity", "periastron_argument",
+                               "phase", "features")]
+
+        return cls(*arrays)
+
+
+def _fit_harmonics(time, values, period, harmonics):
+    phase = 2*pi*np.asarray(time, dtype=float)/period
+    k = np.arange(1, harmonics + 1)
+    design = np.hstack([np.ones((len(phase), 1)),
+                        np.cos(np.outer(phase, k)),
+                        np.sin(np.outer(phase, k))])
+    solution = np.linalg.lstsq(design, np.asarray(values, dtype=float),
+                               rcond=None)[0]
+
+    # The same convention as numpy.fft.rfft: f = Re(sum c_k*exp(ik*phase)).
+    return (solution[1:harmonics + 1]
+            - 1j*solution[harmonics + 1:])
+
+
+def _template_shapes(eccentricity, omega, mean_anomaly):
+    # Shapes of radial velocity curves as in TemplateBank.build. Parameters
+    # of templates are broadcast against the mean anomalies.
+    eccentric_anomaly = solve_kepler_equation_array(mean_anomaly,
+                                                    eccentricity)
+    true_anomaly = 2*np.arctan2(
+        np.sqrt(1 + eccentricity)*np.sin(0.5*eccentric_anomaly),
+        np.sqrt(1 - eccentricity)*np.cos(0.5*eccentric_anomaly))
+
+    return np.cos(omega + true_anomaly) + eccentricity*np.cos(omega)
+
+
+def _fit_shifts(shapes, values, positive):
+    # Fit values with amplitude*shapes + offset along the last axis.
+    shapes = shapes - shapes.mean(axis=-1)[..., np.newaxis]
+    centered = values - values.mean()
+    covariance = (shapes*centered).sum(axis=-1)
+    variance = np.maximum((shapes**2).sum(axis=-1), 1e-300)
+    amplitude = covariance/variance
+    squares = np.maximum((centered**2).sum() - covariance*amplitude, 0.0)
+
+    if positive:
+        squares[amplitude <= 0] = np.inf
+
+    return amplitude, squares
+
+
+def _fit_templates(eccentricity, omega, phase, values, positive,
+                   refinement=32):
+    # Fit curves of templates to observations at given phases (mean
+    # anomalies of the periastron passage at zero). Periastron passages
+    # are scanned on a grid of SHIFTS per period, interpolating tabulated
+    # shapes, and then around the best one with exact shapes.
+    e = eccentricity[:, np.newaxis]
+    w = omega[:, np.newaxis]
+    table = _template_shapes(e, w, 2*pi*np.arange(SHIFTS)/SHIFTS)
+    position = (phase/(2*pi) % 1.0)*SHIFTS
+    lower = np.floor(position).astype(int)
+    weight = position - lower
+    index = (lower - np.arange(SHIFTS)[:, np.newaxis]) % SHIFTS
+    rows = np.arange(len(eccentricity))[:, np.newaxis, np.newaxis]
+    shapes = ((1 - weight)*table[rows, index]
+              + weight*table[rows, (index + 1) % SHIFTS])
+    best = np.argmin(_fit_shifts(shapes, values, positive)[1], axis=1)
+
+    steps = np.linspace(-2.0, 2.0, 4*refinement + 1)
+    shifts = 2*pi*(best[:, np.newaxis] + steps)/SHIFTS
+    shapes = _template_shapes(e[..., np.newaxis], w[..., np.newaxis],
+                              phase - shifts[..., np.newaxis])
+    amplitude, squares = _fit_shifts(shapes, values, positive)
+    best = np.argmin(squares, axis=1)
+    rows = np.arange(len(eccentricity))
+    amplitude = amplitude[rows, best]
+    offset = values.mean() - amplitude*shapes[rows, best].mean(axis=-1)
+
+    return (shifts[rows, best], amplitude, offset,
+            np.sqrt(squares[rows, best]/len(values)))
+
+
+def _normalize_coefficients(coefficients):
+    # Shifting a curve in time multiplies c_k by exp(ik*shift), so
+    # c_k*exp(-ik*phase(c_1)) doesn't depend on the shift.
+    phase = np.angle(coefficients[:, 0])
+    k = np.arange(1, coefficients.shape[1] + 1)
+    shifted = coefficients*np.exp(-1j*np.outer(phase, k))
+    features = np.hstack([shifted.real, shifted.imag])
+    norm = np.linalg.norm(features, axis=1)
+    norm[norm == 0] = 1.0
+
+    return phase, (features/norm[:, np.newaxis]).astype(np.float32)
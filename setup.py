@@ -12,7 +12,7 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/pbrus/binary-doppler-beaming",
     packages=setuptools.find_packages(exclude=["tests"]),
-    install_requires=["numpy", "scipy", "matplotlib"],
+    install_requires=["numpy", "scipy", "matplotlib", "pillow"],
     tests_require=["pytest"],
     keywords=["binary", "doppler", "beaming"],
     classifiers=[
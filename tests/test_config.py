@@ -0,0 +1,122 @@
+"""
+Test package of the bidobe.config module
+"""
+import configparser
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from bidobe.config import *
+
+CONFIG = """
+[OBJECTS]
+mass1 = 1
+mass2 = 2
+temperature1 = 6000
+temperature2 = 8000
+radius1 = 1.0
+radius2 = 1.5
+distance = 1000
+
+[ORBITS]
+sum_major_axis = 8e10
+eccentricity = 0.4
+longitude_node = 70.0
+inclination = 60.0
+periastron_argument = 110.0
+
+[OBSERVATION]
+multiply_period_length = 1.0
+time_length_pieces = 300
+passband = I
+"""
+
+
+class ConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = configparser.ConfigParser()
+        self.config.read_string(CONFIG)
+
+    def test_default_plan(self):
+        plan, = parse_plans(self.config)
+        self.assertEqual(plan.name, "default")
+        self.assertEqual(plan.parameters.temperature2, 8000)
+        self.assertEqual(plan.time_grid.samples, 300)
+        self.assertEqual(plan.outputs.figures, FIGURES)
+        self.assertEqual(choose_backend(plan), "vectorized")
+        self.assertRaises(AttributeError, setattr, plan, "backend", "serial")
+
+    def test_runs_override_base_sections(self):
+        self.config.read_string("[RUN circular]\neccentricity = 0\n"
+                                "[RUN serial]\nbackend = serial\n")
+        default, circular, serial = parse_plans(self.config)
+        self.assertEqual(default.name, "default")
+        self.assertEqual(default.parameters.eccentricity, 0.4)
+        self.assertEqual(circular.parameters.eccentricity, 0.0)
+        self.assertEqual(serial.parameters.eccentricity, 0.4)
+        self.assertEqual(choose_backend(serial), "serial")
+
+    def test_duplicate_runs(self):
+        self.config.read_string("[RUN default]\neccentricity = 0\n")
+        self.assertRaises(ValueError, parse_plans, self.config)
+
+    def test_runs_save_separate_ephemerides(self):
+        self.config["OUTPUT"] = {"ephemeris": os.path.join("out", "e.npy")}
+        self.config.read_string("[RUN circular]\neccentricity = 0\n"
+                                "[RUN own]\nephemeris = own.npy\n")
+        default, circular, own = parse_plans(self.config)
+        self.assertEqual(default.outputs.ephemeris,
+                         os.path.join("out", "e.npy"))
+        self.assertEqual(circular.outputs.ephemeris,
+                         os.path.join("out", "circular_e.npy"))
+        self.assertEqual(own.outputs.ephemeris, "own.npy")
+
+        self.config.read_string("[RUN same]\nephemeris = own.npy\n")
+        self.assertRaises(ValueError, parse_plans, self.config)
+
+    def test_invalid_values(self):
+        self.config["ORBITS"]["eccentricity"] = "1.2"
+        self.config["OBSERVATION"]["passband"] = "X"
+
+        with self.assertRaises(ValueError) as context:
+            parse_plans(self.config)
+
+        self.assertIn("eccentricity", str(context.exception))
+        self.assertIn("passband", str(context.exception))
+
+    def tearDown(self):
+        self.config = None
+
+
+class ExecuteTest(unittest.TestCase):
+
+    def setUp(self):
+        config = configparser.ConfigParser()
+        config.read_string(CONFIG)
+        self.plan, = parse_plans(config)
+        self.directory = tempfile.mkdtemp()
+
+    def test_backends_agree(self):
+        vectorized = execute(self.plan)
+        serial = execute(self.plan._replace(backend="serial"))
+        self.assertEqual(len(vectorized), 300)
+        self.assertLess(np.abs(vectorized.magnitude
+                               - serial.magnitude).max(), 1e-12)
+
+    def test_parallel_writes_ephemeris_file(self):
+        path = os.path.join(self.directory, "ephemeris.npy")
+        outputs = self.plan.outputs._replace(ephemeris=path, figures=())
+        plan = self.plan._replace(backend="parallel", workers=2,
+                                  outputs=outputs)
+        ephemeris = execute(plan)
+        write_outputs(plan, ephemeris)
+        self.assertIsInstance(ephemeris.data, np.memmap)
+        self.assertTrue(np.array_equal(np.load(path),
+                                       execute(self.plan).data))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.plan = None
+        self.directory = None
@@ -0,0 +1,57 @@
+"""
+Test package of the bidobe.conformance module
+"""
+import unittest
+from bidobe.conformance import *
+from bidobe.conformance import _vectorized
+
+
+def _shifted(orbit1, orbit2, object1, object2, time):
+    return {"v1": orbit1.calculate_radial_velocities(time + 60.0)}
+
+
+def _unsupported(orbit1, orbit2, object1, object2, time):
+    raise ValueError("Not supported")
+
+
+class ConformanceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backends = [Backend("vectorized", _vectorized, 1e-7),
+                         Backend("shifted", _shifted, 1e-7),
+                         Backend("unsupported", _unsupported, 1e-7),
+                         Backend("circular", _vectorized, 1e-7,
+                                 max_eccentricity=0.0)]
+        self.results = run_conformance(self.backends, systems=5, samples=30)
+
+    def test_random_systems_cover_extremes(self):
+        systems = random_systems(8)
+        self.assertEqual(max(p["eccentricity"] for p in systems), 0.99)
+        self.assertEqual(set(p["passband"] for p in systems),
+                         set(OrbitingObject.PASSBANDS_CENTRAL_WAVELENGTH))
+
+    def test_backends_are_checked(self):
+        reference, vectorized, shifted, unsupported, circular = self.results
+        self.assertTrue(vectorized["passed"])
+        self.assertEqual(set(vectorized["max_error"]), set(COLUMNS))
+        self.assertFalse(shifted["passed"])
+        self.assertEqual(list(shifted["max_error"]), ["v1"])
+        self.assertFalse(unsupported["passed"])
+        self.assertEqual(unsupported["skipped"], 5)
+        self.assertTrue(circular["passed"])
+        self.assertEqual((circular["domain"], circular["unsupported"]),
+                         ("e<=0", 4))
+
+    def test_registered_backends_reject_nothing_in_their_domain(self):
+        for result in run_conformance(systems=6, samples=30)[1:]:
+            self.assertEqual(result["skipped"], 0)
+            self.assertTrue(result["passed"])
+
+    def test_report(self):
+        report = format_report(self.results)
+        self.assertEqual(len(report.splitlines()), 7)
+        self.assertIn("FAIL", report.splitlines()[4])
+
+    def tearDown(self):
+        self.backends = None
+        self.results = None
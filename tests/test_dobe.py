@@ -49,3 +49,25 @@ class BinaryBrightnessTest(unittest.TestCase):
         self.velocity = None
         self.first_object = None
         self.second_object = None
+
+
+class BinaryBrightnessCurveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.first_object = OrbitingObject(342.5, 0.8, 5500, "V")
+        self.second_object = OrbitingObject(342.5, 1.2, 6920, "V")
+
+    def test_binary_brightness_curve(self):
+        brightness = binary_brightness_curve(self.first_object,
+                                             self.second_object,
+                                             [23500, -1000], [23500, 500])
+        self.assertAlmostEqual(brightness[0], 16.000341102118394,
+                               delta=1e-10)
+        self.first_object.calculate_doppler_coefficient(-1000)
+        self.second_object.calculate_doppler_coefficient(500)
+        self.assertAlmostEqual(brightness[1], binary_brightness(
+            self.first_object, self.second_object), delta=1e-10)
+
+    def tearDown(self):
+        self.first_object = None
+        self.second_object = None
@@ -0,0 +1,76 @@
+"""
+Test package of the bidobe.ephemeris module
+"""
+import unittest
+import numpy as np
+from bidobe.orbit import *
+from bidobe.dobe import *
+from bidobe.ephemeris import *
+
+
+class EphemerisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.orbit1 = Orbit3D(Orbit2DParameters(1.1, 2.4, 1.3e11, 0.14),
+                              Orbit2DOrientation(34.5, 51.9, 170.3))
+        self.orbit2 = Orbit3D(Orbit2DParameters(2.4, 1.1, 1.3e11, 0.14),
+                              Orbit2DOrientation(34.5, 51.9, 350.3))
+        self.object1 = OrbitingObject(763.3, 1.2, 6750, "B")
+        self.object2 = OrbitingObject(763.3, 1.9, 9100, "B")
+        self.time = np.linspace(0.0, self.orbit1.period, 50)
+        self.ephemeris = Ephemeris.from_orbits(self.orbit1, self.orbit2,
+                                               self.object1, self.object2,
+                                               self.time)
+
+    def test_vectorized_and_serial_computations(self):
+        serial = Ephemeris.from_orbits(self.orbit1, self.orbit2,
+                                       self.object1, self.object2,
+                                       self.time, vectorized=False)
+
+        for name, tolerance in (("x1", 1.0), ("y2", 1.0), ("v1", 1e-6),
+                                ("mag", 1e-12)):
+            self.assertLess(np.abs(serial.data[name]
+                                   - self.ephemeris.data[name]).max(),
+                            tolerance)
+
+    def test_positions_are_views(self):
+        position = self.ephemeris.position2
+        self.assertEqual(position.shape, (50, 2))
+        self.assertTrue(np.shares_memory(position, self.ephemeris.data))
+        self.assertEqual(position[7, 1], self.ephemeris.data["y2"][7])
+
+    def test_cached_column(self):
+        days = self.ephemeris.column("time", "days")
+        self.assertIs(days, self.ephemeris.column("time", "days"))
+        self.assertAlmostEqual(days[-1], self.orbit1.period/86400)
+        self.assertIs(self.ephemeris.column("mag").base,
+                      self.ephemeris.data)
+        self.assertRaises(ValueError, self.ephemeris.column, "mag", "days")
+        self.assertRaises(ValueError, self.ephemeris.column, "time", "AU")
+
+    def test_conversion_in_place(self):
+        velocity = self.ephemeris.velocity1.copy()
+        self.ephemeris.convert(position="AU", velocity="km/s")
+        self.assertAlmostEqual(self.ephemeris.velocity1[3],
+                               velocity[3]/1000.0)
+        self.assertEqual(self.ephemeris.units["velocity"], "km/s")
+        self.assertAlmostEqual(self.ephemeris.column("v1", "m/s")[3],
+                               velocity[3])
+
+    def test_mismatched_units(self):
+        time = self.ephemeris.time.copy()
+        self.assertRaises(ValueError, self.ephemeris.convert, time="days",
+                          velocity="AU")
+        self.assertTrue(np.array_equal(self.ephemeris.time, time))
+        self.assertEqual(self.ephemeris.units["time"], "s")
+
+    def test_number_of_samples(self):
+        self.assertEqual(len(Ephemeris(np.int64(3))), 3)
+
+    def tearDown(self):
+        self.orbit1 = None
+        self.orbit2 = None
+        self.object1 = None
+        self.object2 = None
+        self.time = None
+        self.ephemeris = None
@@ -0,0 +1,153 @@
+"""
+Test package of the bidobe.monitor module
+"""
+import asyncio
+import unittest
+from unittest import mock
+import numpy as np
+from bidobe.config import build_system
+from bidobe.conformance import random_systems
+from bidobe.ephemeris import Ephemeris
+from bidobe.monitor import *
+
+
+class StreamMonitorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.systems = [build_system(p) for p in random_systems(6, seed=2)]
+        self.monitor = StreamMonitor(capacity=2)
+
+        for i, system in enumerate(self.systems):
+            self.monitor.add_system("S{0}".format(i), *system)
+
+    def reference(self, i, time):
+        return Ephemeris.from_orbits(*(self.systems[i] + (time,))).magnitude
+
+    def test_predictions_agree_with_ephemeris(self):
+        random = np.random.RandomState(0)
+        expected = {}
+
+        for batch in range(5):
+            index = random.randint(0, 6, 50)
+            period = np.array([self.systems[i][0].period for i in index])
+            time = (batch + random.uniform(0.0, 1.0, 50))*0.3*period
+            prediction, residual = self.monitor.update(index, time,
+                                                       np.zeros(50))
+
+            for i in range(6):
+                points = index == i
+                np.testing.assert_allclose(
+                    prediction[points], self.reference(i, time[points]),
+                    rtol=0, atol=1e-9)
+                expected.setdefault(i, []).extend(residual[points])
+
+        for i in range(6):
+            statistics = self.monitor.statistics("S{0}".format(i))
+            self.assertEqual(statistics["count"], len(expected[i]))
+            self.assertAlmostEqual(statistics["mean"], np.mean(expected[i]),
+                                   delta=1e-9)
+            self.assertAlmostEqual(statistics["std"], np.std(expected[i]),
+                                   delta=1e-9)
+
+    def test_warm_start_of_consecutive_points(self):
+        period = self.systems[4][0].period
+        time = period*np.linspace(0.0, 1.0, 200)
+        self.monitor.update(["S4"], time[:1], [0.0])
+        self.monitor.iterations = 0
+
+        for t in time[1:]:
+            self.monitor.update(["S4"], [t], [0.0])
+
+        self.assertLess(self.monitor.iterations, 4*199)
+        self.assertEqual(self.monitor.statistics("S4")["last_time"], time[-1])
+
+    def test_non_finite_points_are_rejected(self):
+        self.monitor.update(["S1"], [10.0], [16.0])
+        prediction, residual = self.monitor.update(
+            ["S1", "S1", "S1"], [20.0, np.nan, 30.0], [np.nan, 16.0, 16.0])
+        self.assertTrue(np.isnan(prediction[:2]).all())
+        self.assertTrue(np.isnan(residual[:2]).all())
+        self.assertFalse(np.isnan(residual[2]))
+        statistics = self.monitor.statistics("S1")
+        self.assertEqual((statistics["count"], statistics["rejected"]),
+                         (2, 2))
+        self.assertTrue(np.isfinite(statistics["mean"]))
+        self.assertTrue(np.isfinite(statistics["std"]))
+        self.assertEqual(statistics["last_time"], 30.0)
+
+    def test_unknown_system(self):
+        self.assertRaises(ValueError, self.monitor.update, ["X"], [0.0], [0.0])
+        self.assertRaises(ValueError, self.monitor.update, np.array([6]),
+                          [0.0], [0.0])
+        self.assertRaises(ValueError, self.monitor.update, np.array([-1]),
+                          [0.0], [0.0])
+        self.assertRaises(ValueError, self.monitor.add_system, "S0",
+                          *self.systems[0])
+
+    def tearDown(self):
+        self.monitor = None
+
+
+class AsyncStreamMonitorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.system = build_system(random_systems(1)[0])
+        monitor = StreamMonitor()
+        monitor.add_system("S", *self.system)
+        self.stream = AsyncStreamMonitor(monitor, batch_size=16)
+        self.loop = asyncio.new_event_loop()
+
+    def test_points_are_batched(self):
+        time = self.system[0].period*np.linspace(0.0, 1.0, 40)
+
+        async def _submit():
+            self.stream.start()
+            results = await self.stream.submit_many(["S"]*40, time,
+                                                    np.full(40, 16.0))
+            await self.stream.close()
+            return results
+
+        prediction, residual = self.loop.run_until_complete(_submit())
+        np.testing.assert_allclose(
+            prediction, Ephemeris.from_orbits(*(self.system + (time,)))
+            .magnitude, atol=1e-9)
+        np.testing.assert_allclose(residual, 16.0 - prediction)
+        self.assertEqual(self.stream.batches, 3)
+
+    def test_invalid_points_fail_alone(self):
+        async def _submit():
+            self.stream.start()
+            results = await asyncio.gather(
+                self.stream.submit("S", 10.0, 16.0),
+                self.stream.submit("nope", 10.0, 16.0),
+                self.stream.submit("S", None, 16.0),
+                self.stream.submit("S", "x", 16.0),
+                return_exceptions=True)
+            await self.stream.close()
+            return results
+
+        valid, unknown, missing, garbled = self.loop.run_until_complete(
+            _submit())
+        self.assertEqual(len(valid), 2)
+        self.assertIsInstance(unknown, ValueError)
+        self.assertTrue(np.isnan(missing[1]))
+        self.assertIsInstance(garbled, ValueError)
+        self.assertEqual(self.stream.monitor.statistics("S")["count"], 1)
+
+    def test_failures_reach_callers(self):
+        async def _submit():
+            self.stream.start()
+
+            with mock.patch.object(self.stream.monitor, "update",
+                                   side_effect=RuntimeError("broken")):
+                with self.assertRaises(RuntimeError):
+                    await self.stream.submit("S", 10.0, 16.0)
+
+            result = await self.stream.submit("S", 10.0, 16.0)
+            await self.stream.close()
+            return result
+
+        self.assertEqual(len(self.loop.run_until_complete(_submit())), 2)
+
+    def tearDown(self):
+        self.loop.close()
@@ -74,3 +74,40 @@ class Orbit3DTest(unittest.TestCase):
         self.builder3d = None
         self.orbit2d = None
         self.orbit3d = None
+
+
+class OrbitFourierSeriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.orbit1 = Orbit3D(Orbit2DParameters(1.1, 2.4, 1.3e13, 0.64),
+                              Orbit2DOrientation(34.5, 51.9, 170.3))
+        self.orbit2 = Orbit3D(Orbit2DParameters(2.4, 1.1, 1.3e13, 0.64),
+                              Orbit2DOrientation(34.5, 51.9, 350.3))
+        self.series = OrbitFourierSeries.from_orbits(self.orbit1,
+                                                     self.orbit2)
+
+    def test_vectorized_radial_velocities(self):
+        velocities = self.orbit1.calculate_radial_velocities([357842.23])
+        self.orbit1.update(357842.23)
+        self.assertAlmostEqual(velocities[0], self.orbit1.radial_velocity,
+                               delta=1e-6)
+
+    def test_series_evaluation(self):
+        time = [0.0, 357842.23, 0.37*self.orbit1.period]
+        velocities = self.series.evaluate(time, "velocity2")
+        expected = self.orbit2.calculate_radial_velocities(time)
+
+        for velocity, expected_velocity in zip(velocities, expected):
+            self.assertAlmostEqual(velocity, expected_velocity, delta=1e-2)
+
+    def test_serialization(self):
+        series = OrbitFourierSeries.from_dict(self.series.to_dict())
+        self.assertEqual(series.number_of_terms("velocity1"),
+                         self.series.number_of_terms("velocity1"))
+        self.assertAlmostEqual(series.evaluate([1e6], "velocity1")[0],
+                               self.series.evaluate([1e6], "velocity1")[0])
+
+    def tearDown(self):
+        self.orbit1 = None
+        self.orbit2 = None
+        self.series = None
@@ -0,0 +1,39 @@
+"""
+Test package of the bidobe.periodogram module
+"""
+import unittest
+import numpy as np
+from bidobe.periodogram import *
+
+
+class LombScargleTest(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(7)
+        self.period = 3.7
+        self.time = np.sort(random.uniform(0.0, 60.0, 400))
+        signal = 0.002*np.sin(2*np.pi*self.time/self.period)
+        self.magnitude = (16.0 + signal
+                          + random.normal(0.0, 0.002, (3, len(self.time))))
+
+    def test_fast_and_direct_periodograms(self):
+        frequency = frequency_grid(self.time, maximum_frequency=2.0)
+        frequency, power = lomb_scargle(self.time, self.magnitude,
+                                        frequency[0], len(frequency))
+        direct = lomb_scargle_at(self.time, self.magnitude[0], frequency)
+        self.assertEqual(power.shape, (3, len(frequency)))
+        self.assertLess(np.abs(power[0] - direct).max(), 1e-3)
+        self.assertAlmostEqual(frequency[np.argmax(power[0])],
+                               1/self.period, delta=frequency[0])
+
+    def test_beaming_detection(self):
+        detection = beaming_detection(self.time, self.magnitude,
+                                      self.period, harmonics=2)
+        probability = detection["false_alarm_probability"]
+        self.assertEqual(probability.shape, (3, 2))
+        self.assertTrue(np.all(probability[:, 0] < 1e-10))
+        self.assertTrue(np.all(probability[:, 1] > 1e-3))
+
+    def tearDown(self):
+        self.time = None
+        self.magnitude = None
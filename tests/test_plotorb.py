@@ -0,0 +1,202 @@
+"""
+Test package of the bidobe.plotorb module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from bidobe.plotorb import *
+from bidobe.plotorb import (_decimate, _decimate_path, _encode_gif,
+                            _FigureTemplate)
+from bidobe.orbit import Orbit2DParameters, Orbit2DOrientation, Orbit3D
+
+
+class DecimateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.figure = plt.figure(figsize=(4, 3), dpi=100)
+        self.time = np.linspace(0.0, 10.0, 100000)
+        self.magnitude = np.sin(self.time)
+        self.magnitude[12345] = 5.0
+
+    def test_extremes_are_kept(self):
+        time, magnitude = _decimate(self.figure, self.time, self.magnitude)
+        self.assertLessEqual(len(time), 4*400)
+        self.assertEqual(magnitude.max(), 5.0)
+        self.assertEqual(magnitude.min(), self.magnitude.min())
+        self.assertEqual((time[0], time[-1]), (0.0, 10.0))
+        self.assertTrue(np.all(np.diff(time) > 0))
+
+    def test_short_curves_are_not_decimated(self):
+        time, magnitude = _decimate(self.figure, self.time[:500],
+                                    self.magnitude[:500])
+        self.assertEqual(len(time), 500)
+
+    def tearDown(self):
+        plt.close(self.figure)
+        self.figure = None
+        self.time = None
+        self.magnitude = None
+
+
+class DecimatePathTest(unittest.TestCase):
+
+    def setUp(self):
+        self.figure = plt.figure(figsize=(4, 3), dpi=100)
+        self.ax = self.figure.add_subplot(111)
+        orbit = Orbit3D(Orbit2DParameters(1.0, 2.0, 8e10, 0.6),
+                        Orbit2DOrientation(70.0, 60.0, 110.0))
+        time = np.linspace(0.0, 300*orbit.period, 200000)
+        self.x, self.y = orbit.calculate_projected_positions(time)
+        self.ax.set_xlim(self.x.min(), self.x.max())
+        self.ax.set_ylim(self.y.min(), self.y.max())
+
+    def test_path_stays_within_a_pixel(self):
+        x, y = _decimate_path(self.figure, self.ax, self.x, self.y)
+        self.assertLess(len(x), len(self.x)//10)
+        self.assertEqual((x[0], y[0]), (self.x[0], self.y[0]))
+
+        # Both paths are drawn densely on a grid of quarter pixels and
+        # each one must lie within about a pixel of the other.
+        original = self.raster(self.x, self.y)
+        decimated = self.raster(x, y)
+        self.assertLessEqual(
+            distance_transform_edt(~decimated)[original].max(), 6.0)
+        self.assertLessEqual(
+            distance_transform_edt(~original)[decimated].max(), 6.0)
+
+    def raster(self, x, y):
+        image = np.zeros((4*300 + 1, 4*400 + 1), dtype=bool)
+        start = np.column_stack((x[:-1], y[:-1]))
+        stop = np.column_stack((x[1:], y[1:]))
+        valid = ~np.isnan(start).any(axis=1) & ~np.isnan(stop).any(axis=1)
+
+        for fraction in np.linspace(0.0, 1.0, 8):
+            point = start[valid] + fraction*(stop[valid] - start[valid])
+            column = np.round((point[:, 0] - self.x.min())
+                              / np.ptp(self.x)*1600).astype(int)
+            row = np.round((point[:, 1] - self.y.min())
+                           / np.ptp(self.y)*1200).astype(int)
+            image[row, column] = True
+
+        return image
+
+    def tearDown(self):
+        plt.close(self.figure)
+        self.figure = None
+
+
+class OfflineAnimationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.time = np.linspace(0.0, 10.0, 1000)
+        self.magnitude = 16.0 + 0.001*np.sin(self.time)
+
+    def test_frames_with_stride(self):
+        frames = os.path.join(self.directory, "frames")
+        animate_light_curve(self.time, self.magnitude, "days",
+                            filename=frames, stride=200)
+        self.assertEqual(sorted(os.listdir(frames)),
+                         [FRAME_NAME.format(i) for i in range(5)])
+
+    def test_gif(self):
+        filename = os.path.join(self.directory, "velocities.gif")
+        animate_radial_velocities(self.time, self.magnitude, -self.magnitude,
+                                  filename=filename, stride=250)
+        self.assertTrue(os.path.getsize(filename) > 0)
+        self.assertEqual(os.listdir(self.directory), ["velocities.gif"])
+
+    def test_gif_frames_are_streamed(self):
+        import resource
+        from PIL import Image
+
+        frames = 200
+        filename = os.path.join(self.directory, "frames.gif")
+
+        for i in range(frames):
+            Image.new("RGB", (32, 24), (i, 0, 0)).save(
+                os.path.join(self.directory, FRAME_NAME.format(i)))
+
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, hard))
+
+        try:
+            _encode_gif(self.directory, frames, filename, 30)
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+        with Image.open(filename) as image:
+            self.assertEqual(image.n_frames, frames)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.directory = None
+        self.time = None
+        self.magnitude = None
+
+
+class ExportFiguresTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        time = np.linspace(0.0, 10.0, 200)
+        orbit = np.column_stack((np.cos(time), np.sin(time)))
+        self.systems = [{"name": "system{0}".format(i), "time": time,
+                         "orbit1": (i + 1)*orbit, "orbit2": -orbit,
+                         "velocity1": np.sin(time), "velocity2": -np.sin(time),
+                         "magnitude": 16.0 + 0.001*np.sin(time)}
+                        for i in range(3)]
+
+    def test_export_all_kinds(self):
+        filenames = export_figures(self.systems, self.directory, fmt="svg")
+        self.assertEqual(len(filenames), 3*len(FIGURE_KINDS))
+        self.assertIn(os.path.join(self.directory, "system2_orbits.svg"),
+                      filenames)
+        self.assertTrue(all(os.path.getsize(name) > 0 for name in filenames))
+
+    def test_export_selected_kind(self):
+        filenames = export_figures(self.systems, self.directory,
+                                   kinds=("light_curve",), fmt="png")
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["system{0}_light_curve.png".format(i)
+                          for i in range(3)])
+
+    def test_png_is_the_same_as_saved_figure(self):
+        from PIL import Image
+
+        system = dict(self.systems[0])
+        systems = [dict(system, name="copy{0}".format(i)) for i in range(2)]
+        export_figures(systems + self.systems[1:2], self.directory)
+        units = {"orbits": ("m", "m"), "velocities": ("s", "m/s"),
+                 "light_curve": ("s", "mag")}
+
+        for kind in FIGURE_KINDS:
+            template = _FigureTemplate(kind, units[kind][0], units[kind][1],
+                                       100, True)
+            template.update(system)
+            template.figure.tight_layout()
+            reference = os.path.join(self.directory, "reference.png")
+            template.figure.savefig(reference)
+
+            with Image.open(reference) as image:
+                expected = np.asarray(image)
+
+            # The second copy is drawn on the background of the first one.
+            for name in ("copy0", "copy1"):
+                filename = "{0}_{1}.png".format(name, kind)
+
+                with Image.open(os.path.join(self.directory,
+                                             filename)) as image:
+                    self.assertTrue(np.array_equal(np.asarray(image),
+                                                   expected))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.directory = None
+        self.systems = None
@@ -0,0 +1,63 @@
+"""
+Test package of the bidobe.population module
+"""
+import unittest
+import numpy as np
+from bidobe.orbit import *
+from bidobe.dobe import *
+from bidobe.population import *
+
+
+class PopulationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model = PopulationModel(mass_range=(1.0, 5.0))
+        self.systems = self.model.draw(np.random.default_rng(3), 4)
+
+    def test_amplitudes_agree_with_orbiting_objects(self):
+        amplitude, period = beaming_amplitudes(self.systems)
+
+        for i in range(4):
+            parameters, orientation, object1, object2 = system_objects(
+                self.systems, i)
+            orbit1 = Orbit3D(parameters, orientation)
+            orbit2 = Orbit3D(
+                Orbit2DParameters(parameters.second_mass,
+                                  parameters.first_mass,
+                                  parameters.sum_semi_major_axes,
+                                  parameters.eccentricity),
+                Orbit2DOrientation(self.systems["longitude_node"][i],
+                                   self.systems["inclination"][i],
+                                   self.systems["periastron_argument"][i]
+                                   + 180))
+            time = orbit1.period*np.arange(64)/64
+            magnitude = binary_brightness_curve(
+                object1, object2, orbit1.calculate_radial_velocities(time),
+                orbit2.calculate_radial_velocities(time))
+            self.assertAlmostEqual(period[i], orbit1.period, delta=1e-6)
+            self.assertAlmostEqual(amplitude[i], np.ptp(magnitude),
+                                   delta=1e-12)
+
+    def test_reproducible_batches(self):
+        first = synthesize(self.model, 2500, batch_size=1000, seed=5)
+        second = synthesize(self.model, 2500, batch_size=1000, seed=5,
+                            workers=2)
+        self.assertEqual(first.count, 2500)
+        self.assertEqual(first.detected, second.detected)
+        self.assertAlmostEqual(first.mean, second.mean)
+        self.assertTrue(np.array_equal(first.period_histogram,
+                                       second.period_histogram))
+        self.assertEqual(first.period_histogram.sum(), 2500)
+
+    def test_merged_statistics(self):
+        amplitude = np.array([1e-4, 3e-4, 2e-3, 5e-5])
+        period = np.full(4, 86400.0)
+        summary = PopulationSummary().update(amplitude[:1], period[:1])
+        summary.update(amplitude[1:], period[1:])
+        self.assertAlmostEqual(summary.mean, amplitude.mean())
+        self.assertAlmostEqual(summary.std, amplitude.std())
+        self.assertEqual(summary.detected, 3)
+
+    def tearDown(self):
+        self.model = None
+        self.systems = None
@@ -0,0 +1,96 @@
+"""
+Test package of the bidobe.profiling module
+"""
+import configparser
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from bidobe.config import parse_plans, execute, write_outputs
+from bidobe import profiling
+from bidobe.profiling import *
+from tests.test_config import CONFIG
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def test_stages_are_recorded_only_when_active(self):
+        with profile_stage("ignored"):
+            pass
+
+        with Profiler(interval=0.001) as profiler:
+            with profile_stage("outer", size=1000):
+                data = [np.ones(100000) for i in range(5)]
+
+                with profile_stage("inner"):
+                    time.sleep(0.02)
+
+                del data
+
+        self.assertIsNone(active_profiler())
+        stages = profiler.summary()
+        self.assertEqual([stage["name"] for stage in stages],
+                         ["outer", "inner"])
+        self.assertEqual(stages[0]["details"], {"size": 1000})
+        self.assertEqual(stages[1]["depth"], 1)
+        if profiling._STAGE_PEAKS:
+            self.assertGreaterEqual(
+                stages[0]["peak"] - stages[0]["memory_start"], 4000000)
+        self.assertGreaterEqual(stages[1]["duration"], 0.02)
+        self.assertTrue(any("profiling" in allocation["location"] or
+                            "test_profiling" in allocation["location"]
+                            for allocation in stages[0]["top_allocations"]))
+        self.assertTrue(any(stack.startswith("[outer];[inner]")
+                            for stack in profiler.samples))
+
+    def test_no_peaks_without_reset(self):
+        with mock.patch.object(profiling, "_STAGE_PEAKS", False):
+            with Profiler(interval=0, allocations=0) as profiler:
+                with profile_stage("outer"):
+                    with profile_stage("inner"):
+                        data = np.ones(100000)
+
+                    del data
+
+        for stage in profiler.summary():
+            self.assertIn("memory_end", stage)
+            self.assertNotIn("peak", stage)
+
+    def test_traces_of_a_run(self):
+        config = configparser.ConfigParser()
+        config.read_string(CONFIG)
+        config["OUTPUT"] = {"directory": self.directory, "format": "png",
+                            "figures": "light_curve"}
+        plan = parse_plans(config)[0]
+        trace = os.path.join(self.directory, "trace.json")
+        folded = os.path.join(self.directory, "trace.folded")
+
+        with Profiler(interval=0.001) as profiler:
+            write_outputs(plan, execute(plan))
+
+        profiler.write_chrome_trace(trace)
+        profiler.write_collapsed(folded)
+
+        with open(trace) as trace_file:
+            events = json.load(trace_file)["traceEvents"]
+
+        names = [event["name"] for event in events if event["ph"] == "X"]
+        self.assertEqual(names, ["execute", "compute_chunk", "convert_units",
+                                 "figure"])
+        self.assertIn("memory_end", events[1]["args"])
+        self.assertEqual("peak" in events[1]["args"], profiling._STAGE_PEAKS)
+
+        with open(folded) as folded_file:
+            for line in folded_file:
+                stack, count = line.rsplit(" ", 1)
+                self.assertGreater(int(count), 0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
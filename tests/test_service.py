@@ -0,0 +1,171 @@
+"""
+Test package of the bidobe.service module
+"""
+import asyncio
+import os
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bidobe.service import *
+
+
+def _kill_worker(parameters):
+    os._exit(1)
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LRUCache(2)
+
+    def test_least_recently_used_is_removed(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.cache.get("a")
+        self.cache.put("c", 3)
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_hits_and_misses(self):
+        self.cache.put("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_bounded_bytes(self):
+        cache = LRUCache(10, maxbytes=10)
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        cache.put("a", b"123")
+        cache.put("c", b"1234")
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.bytes, 7)
+        cache.put("d", b"12345678901")
+        self.assertNotIn("d", cache)
+        self.assertEqual(len(cache), 2)
+
+    def tearDown(self):
+        self.cache = None
+
+
+class LightCurveServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parameters = {
+            "mass1": 1, "mass2": 2, "temperature1": 6000,
+            "temperature2": 8000, "radius1": 1.0, "radius2": 1.5,
+            "distance": 1000, "sum_major_axis": 8e10, "eccentricity": 0.4,
+            "longitude_node": 70.0, "inclination": 60.0,
+            "periastron_argument": 110.0, "multiply_period_length": 1.0,
+            "time_length_pieces": 20, "passband": "I"}
+        self.loop = asyncio.new_event_loop()
+        self.service = LightCurveService(4, executor=ThreadPoolExecutor(2))
+
+    def test_missing_parameters(self):
+        del self.parameters["mass1"]
+        self.assertRaises(ValueError, compute_curves, self.parameters)
+
+    def test_invalid_parameters(self):
+        for name, value in (("time_length_pieces", 0), ("mass1", None),
+                            ("eccentricity", 1.0), ("radius2", -1.0),
+                            ("passband", "X")):
+            parameters = dict(self.parameters)
+            parameters[name] = value
+            self.assertRaises(ValueError, normalize_parameters, parameters)
+
+        self.assertRaises(ValueError, normalize_parameters, [1, 2])
+        self.assertRaises(ValueError, normalize_parameters, self.parameters,
+                          max_samples=19)
+        self.assertEqual(normalize_parameters(
+            self.parameters, max_samples=20)["time_length_pieces"], 20)
+
+    def test_too_many_samples(self):
+        service = LightCurveService(executor=ThreadPoolExecutor(1),
+                                    max_samples=10)
+
+        try:
+            with self.assertRaises(ValueError):
+                self.loop.run_until_complete(service.compute(self.parameters))
+        finally:
+            self.loop.run_until_complete(service.close())
+
+        self.assertEqual(service.computations, 0)
+
+    def test_broken_pool_is_replaced(self):
+        service = LightCurveService(workers=1)
+        broken = service.executor
+
+        try:
+            with mock.patch("bidobe.service._encode_curves", _kill_worker):
+                with self.assertRaises(BrokenProcessPool):
+                    self.loop.run_until_complete(
+                        service.compute(self.parameters))
+
+            self.assertIsNot(service.executor, broken)
+            self.assertEqual(service.restarts, 1)
+            encoded = self.loop.run_until_complete(
+                service.compute(self.parameters))
+            self.assertIn(b"magnitude", encoded)
+        finally:
+            self.loop.run_until_complete(service.close())
+
+    def test_identical_requests_are_computed_once(self):
+        async def _compute_concurrently():
+            return await asyncio.gather(*[
+                self.service.compute(self.parameters) for i in range(5)])
+
+        results = self.loop.run_until_complete(_compute_concurrently())
+        self.loop.run_until_complete(self.service.compute(self.parameters))
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.service.computations, 1)
+        self.assertEqual(self.service.cache.hits, 1)
+
+    def test_request_over_tcp(self):
+        server = self.loop.run_until_complete(self.service.start(port=0))
+        port = server.sockets[0].getsockname()[1]
+        curves = self.loop.run_until_complete(
+            request_curves(self.parameters, port=port))
+        self.assertEqual(len(curves["magnitude"]), 20)
+        self.assertEqual(curves, compute_curves(self.parameters))
+
+    def test_errors_over_tcp(self):
+        server = self.loop.run_until_complete(self.service.start(port=0))
+        port = server.sockets[0].getsockname()[1]
+        self.parameters["mass1"] = None
+
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(
+                request_curves(self.parameters, port=port))
+
+        self.parameters["mass1"] = 1
+
+        with mock.patch("bidobe.service._encode_curves",
+                        side_effect=ZeroDivisionError("division by zero")):
+            with self.assertRaises(RuntimeError):
+                self.loop.run_until_complete(
+                    request_curves(self.parameters, port=port))
+
+    def test_garbled_response(self):
+        async def _garbage(reader, writer):
+            writer.write(b"garbage")
+            writer.close()
+
+        server = self.loop.run_until_complete(
+            asyncio.start_server(_garbage, "127.0.0.1", 0))
+        port = server.sockets[0].getsockname()[1]
+
+        with self.assertRaises(ConnectionError):
+            self.loop.run_until_complete(
+                request_curves(self.parameters, port=port))
+
+        server.close()
+        self.loop.run_until_complete(server.wait_closed())
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.service.close())
+        self.loop.close()
+        self.parameters = None
+        self.service = None
+        self.loop = None
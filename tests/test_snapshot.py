@@ -0,0 +1,83 @@
+"""
+Test package of the bidobe.snapshot module
+"""
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import numpy as np
+from bidobe.config import build_system
+from bidobe.conformance import random_systems
+from bidobe.ephemeris import Ephemeris
+from bidobe.snapshot import *
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "grid.bds")
+        self.parameters = random_systems(6, seed=4)
+        self.parameters[5]["eccentricity"] = self.parameters[4][
+            "eccentricity"]
+
+        with SnapshotWriter(self.filename, 6, 50,
+                            metadata={"grid": "test"}) as writer:
+            for p in self.parameters:
+                writer.append(p)
+
+    def test_constants_and_curves(self):
+        snapshot = Snapshot(self.filename)
+        orbit1, orbit2, object1, object2 = build_system(self.parameters[3])
+        system = snapshot.system(3)
+        self.assertEqual((len(snapshot), snapshot.samples), (6, 50))
+        self.assertEqual(snapshot.metadata, {"grid": "test"})
+        self.assertEqual(system["period"], orbit1.period)
+        self.assertEqual(system["amplitude2"],
+                         orbit2.calculate_radial_velocity_amplitude())
+        self.assertEqual(system["flux1"], object1.flux)
+        self.assertEqual(snapshot.parameters(3).passband,
+                         self.parameters[3]["passband"])
+
+        ephemeris = snapshot.ephemeris(3)
+        expected = Ephemeris.from_orbits(orbit1, orbit2, object1, object2,
+                                         ephemeris.time)
+        self.assertIsInstance(ephemeris.data, np.memmap)
+        np.testing.assert_array_equal(ephemeris.data, expected.data)
+
+        ephemeris.convert(time="days")
+        self.assertEqual(Snapshot(self.filename).ephemeris(3).units["time"],
+                         "s")
+        self.assertEqual(Snapshot(self.filename).ephemeris(3).time[1],
+                         expected.time[1])
+
+    def test_find(self):
+        snapshot = Snapshot(self.filename)
+        p = self.parameters
+        np.testing.assert_array_equal(
+            snapshot.find(mass1=p[2]["mass1"]), [2])
+        np.testing.assert_array_equal(
+            snapshot.find(eccentricity=p[4]["eccentricity"]), [4, 5])
+        np.testing.assert_array_equal(
+            snapshot.find(eccentricity=p[4]["eccentricity"],
+                          passband=p[5]["passband"]), [5])
+        self.assertEqual(len(snapshot.find(mass1=-1.0)), 0)
+        self.assertRaises(ValueError, snapshot.find, color=1)
+
+    def test_invalid_files(self):
+        incomplete = os.path.join(self.directory, "incomplete.bds")
+        SnapshotWriter(incomplete, 1, 10)
+        self.assertRaises(ValueError, Snapshot, incomplete)
+
+        with open(self.filename, "r+b") as snapshot_file:
+            snapshot_file.seek(8)
+            snapshot_file.write(struct.pack("<H", VERSION[0] + 1))
+
+        self.assertRaises(ValueError, Snapshot, self.filename)
+        self.assertRaises(ValueError, read_header, __file__)
+        self.assertRaises(ValueError, SnapshotWriter, incomplete, 1, 10,
+                          index=("color",))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
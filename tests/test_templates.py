@@ -0,0 +1,90 @@
+"""
+Test package of the bidobe.templates module
+"""
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from bidobe.orbit import *
+from bidobe.templates import *
+
+
+class TemplateBankTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bank = TemplateBank.build(np.linspace(0.0, 0.9, 46),
+                                       np.arange(0.0, 360.0, 5.0))
+        self.orbit = Orbit3D(Orbit2DParameters(1.1, 2.4, 1.3e11, 0.4,
+                                               periastron_passage=2.5e5),
+                             Orbit2DOrientation(34.5, 51.9, 170.0))
+        self.time = np.linspace(0.0, 3*self.orbit.period, 97)
+        self.velocity = self.orbit.calculate_radial_velocities(self.time)
+
+    def test_nearest_template(self):
+        match = self.bank.query(self.time, self.velocity,
+                                self.orbit.period, k=3)[0]
+        self.assertAlmostEqual(match["eccentricity"], 0.4)
+        self.assertAlmostEqual(match["periastron_argument"], 170.0)
+        self.assertAlmostEqual(match["periastron_passage"], 2.5e5,
+                               delta=1e-3*self.orbit.period)
+
+    def test_eccentric_orbit_with_sparse_epochs(self):
+        random = np.random.RandomState(0)
+
+        for eccentricity, argument in ((0.86, 240.0), (0.7, 95.0),
+                                       (0.8, 120.0), (0.9, 300.0)):
+            orbit = Orbit3D(Orbit2DParameters(1.1, 2.4, 1.3e11, eccentricity,
+                                              periastron_passage=2.5e5),
+                            Orbit2DOrientation(34.5, 51.9, argument))
+            time = np.sort(random.uniform(0.0, 20*orbit.period, 60))
+            match = self.bank.query(
+                time, orbit.calculate_radial_velocities(time),
+                orbit.period)[0]
+            self.assertAlmostEqual(match["eccentricity"], eccentricity)
+            self.assertAlmostEqual(match["periastron_argument"], argument)
+            self.assertAlmostEqual(match["periastron_passage"], 2.5e5,
+                                   delta=1e-3*orbit.period)
+            amplitude = orbit.calculate_radial_velocity_amplitude()
+            self.assertAlmostEqual(match["amplitude"], amplitude,
+                                   delta=1e-3*amplitude)
+            self.assertLess(match["residual"], 1e-3*amplitude)
+
+    def test_eccentricity_between_templates(self):
+        orbit = Orbit3D(Orbit2DParameters(1.1, 2.4, 1.3e11, 0.85),
+                        Orbit2DOrientation(34.5, 51.9, 60.0))
+        time = np.sort(np.random.RandomState(1).uniform(
+            0.0, 20*orbit.period, 60))
+        match = self.bank.query(time, orbit.calculate_radial_velocities(time),
+                                orbit.period)[0]
+        self.assertAlmostEqual(match["eccentricity"], 0.85, delta=0.05)
+        self.assertAlmostEqual(match["periastron_argument"], 60.0,
+                               delta=10.0)
+
+    def test_magnitudes_of_both_signs(self):
+        magnitude = 16.0 - 1e-6*self.velocity
+        match = self.bank.query(self.time, magnitude, self.orbit.period,
+                                curve="magnitude")[0]
+        self.assertAlmostEqual(match["eccentricity"], 0.4)
+        self.assertAlmostEqual(match["periastron_argument"], 170.0)
+        self.assertLess(match["amplitude"], 0.0)
+        self.assertAlmostEqual(match["offset"], 16.0, delta=1e-6)
+
+    def test_saved_bank_is_memory_mapped(self):
+        directory = tempfile.mkdtemp()
+
+        try:
+            self.bank.save(directory)
+            bank = TemplateBank.load(directory)
+            self.assertIsInstance(bank.features, np.memmap)
+            self.assertEqual(len(bank), len(self.bank))
+            self.assertEqual(
+                bank.query(self.time, self.velocity, self.orbit.period),
+                self.bank.query(self.time, self.velocity, self.orbit.period))
+        finally:
+            shutil.rmtree(directory)
+
+    def tearDown(self):
+        self.bank = None
+        self.orbit = None
+        self.time = None
+        self.velocity = None